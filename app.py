@@ -1,36 +1,47 @@
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-import numpy as np
-import datetime
-import os
 
-file_path = os.path.join(os.path.dirname(__file__), 'Silly_Fragrance_excel.xlsx')
-
-from wears import WearsFunctions
+# only what is needed before the page config is imported here (python startup.py times it). The
+# table and index modules come with the data, plotting (plotly) and excel parsing (openpyxl) where
+# they're used
+import core
+from profiler import RerunProfiler
 
 # streamlit run app.py
 # tutorial https://medium.com/@vishaltyagi.dev098/excel-sheet-interactive-dashboard-python-streamlit-114f7c240fc8
 
-df=pd.read_excel(
-    io=file_path,
-    engine='openpyxl',
-    sheet_name='Insane Persons Sheet'
-)
-df=df.dropna(how='all')
-
-df = df.dropna(subset=[df.columns[0], df.columns[1]], how='any')
-df["Retail $/mL"]=df["$"]/df["mL"]
-
-wears_df=WearsFunctions.read_wears()
-
-# PANDAS DATABASE CREATION
+# first, so the page layout reaches the browser before the data is loaded
 st.set_page_config(
   page_title="Insane Fragrance Dashboard",
   page_icon=":lipstick:",
   layout="wide"                 
 )
 
+# timings per stage, only when profiling (CLUBSMELL_PROFILE=1 or ?profile=1)
+profiler=RerunProfiler.for_rerun()
+
+# a snapshot (CLUBSMELL_SNAPSHOT) or the watched workbooks, see core.py. Timed as its own stage:
+# a cold start parses the workbooks here, later reruns reuse the built data
+with profiler.stage("data") as info:
+    data_snapshot, dataset=core.data(info)
+
+# already imported by core.data() (watcher.py or snapshot.py), and so timed in the "data" stage
+from consumption import AtomizerProfiles
+from wears import WearsFunctions, WearsIndex
+from facets import FacetIndex
+from search import SearchIndex
+from similar import SimilarityIndex
+
+with profiler.stage("load catalog") as info:
+    df=data_snapshot.catalog if data_snapshot else dataset.catalog
+    info["rows"]=len(df)
+
+with profiler.stage("read_wears") as info:
+    wears_df=data_snapshot.wears if data_snapshot else dataset.wears
+    info["rows"]=len(wears_df)
+
+# PANDAS DATABASE CREATION
+
 
 # SIDEBAR
 
@@ -56,41 +67,45 @@ st.set_page_config(
 #  "Fragrance== @fragrance"
 # )
 
-df_sort_score = df.dropna(subset=["Score out of 100"]).sort_values(by='Score out of 100',ascending=False)
-
-df['First_Word_Type'] = df['Type'].str.split().str[0]
-unique_first_words = df['First_Word_Type'].dropna().unique()
+# sidebar options are read from the facet index, built once per catalog version
+with profiler.stage("facet index"):
+    facets=FacetIndex.of(df)
+
+# search box over names, houses, perfumers, types and notes (trigram index in search.py, prebuilt
+# per catalog version). Picking a result jumps to its page whatever the filters below say
+query=st.sidebar.text_input('Search fragrances, houses, perfumers or notes:')
+with profiler.stage("search") as info:
+    results=SearchIndex.of(df).search(query, k=20) if query else []
+    info["results"]=len(results)
+searched=None
+if results:
+    searched=st.sidebar.selectbox('Search results:', options=[frag for frag, score in results])
+elif query:
+    st.sidebar.caption("No matches.")
 
 # Sidebar filter selection
-filter_choice = st.sidebar.selectbox('Filter by House, Perfumer, Type, or See All:', options=['House', 'Perfumer', 'Type','All Fragrances'])
+filter_choice = st.sidebar.selectbox('Filter by House, Perfumer, Type, or See All:', options=FacetIndex.FILTERS)
 
 # Filter based on the first choice
-if filter_choice == 'House':
-    selected_house = st.sidebar.selectbox('Select House:', options=df['House'].dropna().unique())
-    filtered_fragrances_house = df[df['House'] == selected_house]['Fragrance'].unique()
-    fragrance = st.sidebar.selectbox('Select Fragrance:', options=filtered_fragrances_house)
-    
-
-    
-elif filter_choice == 'Perfumer':
-    selected_house = st.sidebar.selectbox('Select Perfumer:', options=df['Perfumer'].dropna().unique())
-    filtered_fragrances_house = df[df['Perfumer'] == selected_house]['Fragrance'].unique()
-    fragrance = st.sidebar.selectbox('Select Fragrance:', options=filtered_fragrances_house)
-
-
-elif filter_choice == 'Type':
-    selected_house = st.sidebar.selectbox('Select Type:', options=unique_first_words)
-    filtered_fragrances_house = df[df['First_Word_Type'] == selected_house]['Fragrance'].unique()
+if filter_choice in ('House', 'Perfumer', 'Type'):
+    selected_house = st.sidebar.selectbox(f'Select {filter_choice}:', options=facets.options[filter_choice])
+    filtered_fragrances_house = facets.fragrances_for(filter_choice, selected_house)
     fragrance = st.sidebar.selectbox('Select Fragrance:', options=filtered_fragrances_house)
     
 elif filter_choice == 'All Fragrances':
-    fragrance = st.sidebar.selectbox('Select Fragrance, ordered best to worst:', options=df_sort_score["Fragrance"].unique())
+    fragrance = st.sidebar.selectbox('Select Fragrance, ordered best to worst:', options=facets.fragrances_for(filter_choice))
 
 
     
-df_selection=df.query(
- "Fragrance== @fragrance"
-)
+if searched is not None:
+    fragrance=searched
+
+# one catalog row per fragrance (validation.py), none when the filters leave nothing to pick
+df_selection=facets.selection(fragrance)
+if not len(df_selection):
+    st.header("No fragrances to show.")
+    profiler.finish()
+    st.stop()
 
 st.header(fragrance)
 
@@ -115,17 +130,19 @@ for note in df_selection["My notes"]:
     st.markdown(note)
 
 
-if pd.notna(df_selection["Score out of 100"]).any():
+score_value=df_selection["Score out of 100"].iloc[0]
+if pd.notna(score_value):
 
-    score=int(df_selection["Score out of 100"])
+    score=int(score_value)
 else:
     score="NA"
-if pd.notna(df_selection["Performance (1-10)"]).any():
-    perfo=int(df_selection["Performance (1-10)"])
+perfo_value=df_selection["Performance (1-10)"].iloc[0]
+if pd.notna(perfo_value):
+    perfo=int(perfo_value)
 else:
     perfo="NA"
-scent_value=df_selection["Scent (1-10)*"]
-if pd.notna(scent_value).any():
+scent_value=df_selection["Scent (1-10)*"].iloc[0]
+if pd.notna(scent_value):
     # Round the value to 4 decimal places
     scent = round(float(scent_value), 4)
 else:
@@ -155,6 +172,12 @@ with c1:
     st.subheader(f"{scent}")    
     st.write('<div style="{}">(1-10) A 10 smells of beauty, perfection. Some fragrances will be alotted an extra 0.25. This floating point is awarded to personal favorites that I am drawn to emotionally, with reckless abandon.</div>'.format(small_text_style), unsafe_allow_html=True)
 
+# fragrances like this one: same house/perfumer/type, close scores and price, similar notes (similar.py)
+with profiler.stage("similar") as info:
+    neighbours=SimilarityIndex.of(df).neighbours(fragrance, k=5)
+if neighbours:
+    st.subheader("Fragrances like this one")
+    st.markdown("\n".join(f"1. {frag} ({similarity:.0%} alike)" for frag, similarity in neighbours))
 
 
 
@@ -162,30 +185,58 @@ with c1:
 st.markdown("---")
 # WEARS PER YEAR and predicted end year
 
-total_wear_frags=len(wears_df["Fragrance"].unique())
-
-if wears_df["Fragrance"].isin([fragrance]).any():
+with profiler.stage("wears index + wear log") as info:
+    # the dataset's own index, the one its projection and ledger are keyed on
+    wears_index=WearsIndex.of(wears_df) if data_snapshot else dataset.wears_index
+    # fold in wears logged since the workbook was last updated (wear_log.csv), only reads what's new.
+    # a snapshot already includes the log
+    if data_snapshot is None:
+        info["log_entries"]=wears_index.sync_log()
+# wear log lines that were skipped, so the log can be fixed
+if wears_index.log_skipped:
+    st.sidebar.warning(f"{len(wears_index.log_skipped)} wear log lines couldn't be read and were skipped, "
+                       f"e.g. {','.join(wears_index.log_skipped[0])}")
+if wears_index.log_unknown:
+    st.sidebar.warning(f"Wear log entries skipped, wears not tracked for: {', '.join(wears_index.log_unknown)}")
+total_wear_frags=len(wears_index)
+# run out projection for the whole collection in one vectorized pass
+with profiler.stage("project_all") as info:
+    projection=data_snapshot.projection if data_snapshot else dataset.projection()
+    info["rows"]=len(projection)
+# cost per wear, spend and what's left for the whole collection, from the atomizer profiles (consumption.py)
+with profiler.stage("ledger") as info:
+    ledger=data_snapshot.ledger if data_snapshot else dataset.ledger()
+    info["rows"]=len(ledger.frame)
+cost_per_wear=ledger.values("Cost per Wear", [fragrance])[0]
+
+if fragrance in wears_index:
     st.subheader("Wears Tracker")
 
 
-    wears, ranking, ml_left, plot_df,ml_start=WearsFunctions.sum_wears(wears_df,fragrance)
-    plot, slope=WearsFunctions.plot_wears(plot_df, ml_start)
+    with profiler.stage("sum_wears") as info:
+        wears, ranking, ml_left, plot_df,ml_start=WearsFunctions.sum_wears(wears_df,fragrance)
+        info["rows"]=len(plot_df)
+    # a slice of the yearly rollup, built only on a cache miss: new fragrance, new data or a new day
+    with profiler.stage("plot_wears"):
+        if data_snapshot:
+            plot=data_snapshot.chart(fragrance, "cumulative_wears")
+        else:
+            plot, slope=WearsFunctions.cumulative_wears_plot(fragrance, wears_df)
     
-    st.plotly_chart(WearsFunctions.all_wears_plot(fragrance,wears_df))
+    with profiler.stage("all_wears_plot"):
+        all_wears_fig=data_snapshot.chart(fragrance, "all_wears") if data_snapshot else WearsFunctions.all_wears_plot(fragrance,wears_df)
+    profiler.plotly_chart(all_wears_fig, "all wears")
 
     
-    st.plotly_chart(plot)
+    profiler.plotly_chart(plot, "cumulative wears")
 
     bottle_size=plot_df["mL"].values[0]
+    backups=plot_df["Backups"].values[0]
     #show total wears and all time ranking and year to run out
     w1,w2,w3=st.columns(3)
     with w1:
         st.subheader("Starting mL")
         st.subheader(f"{ml_start}")
-        st.plotly_chart(WearsFunctions.plot_bottles(1,bottle_size) )
-
-        for i in range(0,plot_df["Backups"].values[0] ):
-            st.plotly_chart(WearsFunctions.plot_bottles(1,bottle_size) )
     #with w2:
     #    st.subheader("Total Wears")
     #    st.subheader(f"{wears}")
@@ -193,44 +244,91 @@ if wears_df["Fragrance"].isin([fragrance]).any():
     with w2:
         st.subheader("Remaining mL")
         st.subheader(f"{round(ml_left)}")
-        
-        
-        if plot_df["Backups"].values[0]>0:
-            pct_list=WearsFunctions.list_mult_bottles(ml_left,ml_start,plot_df)
 
-            for i in pct_list:
-                st.plotly_chart(WearsFunctions.plot_bottles(i,bottle_size) )
-        else:
-            st.plotly_chart(WearsFunctions.plot_bottles(ml_left/ml_start,bottle_size) )
+    if backups>0:
+        pct_list=WearsFunctions.list_mult_bottles(ml_left,ml_start,plot_df)
+    else:
+        pct_list=[ml_left/ml_start]
 
 
-    year_empty=round( datetime.datetime.now().year +(ml_left *3 /slope ) )
+    year_empty=projection.loc[projection["Fragrance"]==fragrance, "Year to Run out"].iloc[0]
     with w3:
         st.subheader("Year to Run out")
         st.subheader(f"{year_empty}")
-        if pd.isna(df_selection["Retail $/mL"]).any()==False:
+        if pd.isna(cost_per_wear)==False:
             st.subheader("💸💸💸")
-            moolah = df_selection["Retail $/mL"].values[0] / 3
+            moolah = cost_per_wear
             formatted_moolah = "${:.2f}".format(moolah)
             #styled_text = f'<p style="color: #d4b2f1; font-size: xx-large;">{formatted_moolah}/Wear</p>'
             #st.markdown(styled_text, unsafe_allow_html=True)
             st.subheader(f"{formatted_moolah} per Wear")
 
+    # every bottle in one chart: starting bottles on the left, what's left of them on the right
+    with profiler.stage("plot_bottle_stack") as info:
+        if data_snapshot:
+            bottles_fig=data_snapshot.chart(fragrance, "bottles")
+        else:
+            bottles_fig=WearsFunctions.plot_bottle_stack([1]*(backups+1), pct_list, bottle_size)
+        info["bottles"]=int(backups)+1
+    profiler.plotly_chart(bottles_fig, "bottles")
+
 
 else:
     st.subheader("Wears not tracked yet.")
-    if pd.isna(df_selection["Retail $/mL"]).any()==False:
+    if pd.isna(cost_per_wear)==False:
         st.subheader("💸💸💸")
-        moolah = df_selection["Retail $/mL"].values[0] / 3
+        moolah = cost_per_wear
         formatted_moolah = "${:.2f}".format(moolah)
         #styled_text = f'<p style="color: #d4b2f1; font-size: xx-large;">{formatted_moolah}/Wear</p>'
         #st.markdown(styled_text, unsafe_allow_html=True)
         st.subheader(f"{formatted_moolah} per Wear")
 
-    
+with st.expander("What runs out when"):
+    st.caption("Wears per Year counts recent wears more (a wear a year old counts half), so Year to Run out follows what is in rotation now.")
+    # formatted in the browser (column_config) rather than with a Styler, which renders every cell on every rerun
+    st.dataframe(
+        projection,
+        column_config={
+            "Starting mL": st.column_config.NumberColumn(format="%.0f"),
+            "Remaining mL": st.column_config.NumberColumn(format="%.0f"),
+            "Bottles Left": st.column_config.NumberColumn(format="%.2f"),
+            "Wears per Year": st.column_config.NumberColumn(format="%.1f"),
+            "Cost per Wear": st.column_config.NumberColumn(format="$%.2f"),
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+with st.expander("What the collection cost"):
+    totals=ledger.totals()
+    st.caption(f"\\${totals['Spend']:,.0f} spent on the bottles owned, \\${totals['Used Value']:,.0f} of it worn, "
+               f"\\${totals['Remaining Value']:,.0f} left. Effective Cost per Wear is what each wear so far has cost.")
+    st.dataframe(
+        ledger.frame[ledger.frame["Bottles"].notna()],
+        column_order=["Fragrance", "Wears", "Sprays per Wear", "Sprays per mL", "Starting mL", "Remaining mL",
+                      "Cost per Wear", "Spend", "Effective Cost per Wear", "Remaining Value"],
+        column_config={
+            "Sprays per Wear": st.column_config.NumberColumn(format="%g"),
+            "Sprays per mL": st.column_config.NumberColumn(format="%g"),
+            "Wears": st.column_config.NumberColumn(format="%.0f"),
+            "Starting mL": st.column_config.NumberColumn(format="%.0f"),
+            "Remaining mL": st.column_config.NumberColumn(format="%.0f"),
+            "Cost per Wear": st.column_config.NumberColumn(format="$%.2f"),
+            "Spend": st.column_config.NumberColumn(format="$%.0f"),
+            "Effective Cost per Wear": st.column_config.NumberColumn(format="$%.2f"),
+            "Remaining Value": st.column_config.NumberColumn(format="$%.0f"),
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
 st.write('<div style="{}">Data from Anonymous Man, to whom I am grateful :)<br> By CLUBSMELL</div>'.format(small_text_style), unsafe_allow_html=True)
 st.markdown('<a href="http://www.clubsmell.com" style="color: #602ec9;">CLUBSMELL.COM</a>', unsafe_allow_html=True)
 
 st.markdown('---')
 
-st.write('<div style="{}"> Details and Assumptions<br> 1. Wears visualized for 2021-2022 were tracked together since July 2021. For the line graph, I halved the total for 2021-2022 and assigned the rounded down value to 2021, and rounded up for 2022.<br>2. I assumed 12 sprays per 1 mL, 4 sprays for 1 wear, so that is 3 wears per 1 mL! This is a gross approximation and changes based on atomizer size and type.<br>3. Last updated 3 February 2024. </div>'.format(small_text_style), unsafe_allow_html=True)
+profiles=AtomizerProfiles.current()
+st.write('<div style="{}"> Details and Assumptions<br> 1. Wears visualized for 2021-2022 were tracked together since July 2021. For the line graph, I halved the total for 2021-2022 and assigned the rounded down value to 2021, and rounded up for 2022.<br>2. Unless set otherwise for a fragrance (atomizers.csv), I assumed {:g} sprays per 1 mL, {:g} sprays for 1 wear, so that is {:g} wears per 1 mL! This is a gross approximation and changes based on atomizer size and type.<br>3. Last updated 3 February 2024. </div>'.format(
+    small_text_style, profiles.sprays_per_ml, profiles.sprays_per_wear, profiles.sprays_per_ml / profiles.sprays_per_wear), unsafe_allow_html=True)
+
+profiler.finish()
@@ -0,0 +1,241 @@
+"""
+Benchmarks for the dashboard's data pipeline, without running Streamlit.
+
+Builds synthetic catalogs and wear tables of growing size and times each hot path
+(median of --repeat runs) along with its peak traced memory.
+
+    python benchmark.py                                  # 1k, 10k, 100k and 1M wear rows
+    python benchmark.py --sizes 1000 50000 --years 10 --json bench.json
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import loader
+import validation
+from consumption import AtomizerProfiles, SpendLedger
+from cube import AggregateCube
+from figure_cache import FIGURES
+from mod_dynamic_filters import FilterEngine
+from search import SearchIndex
+from similar import SimilarityIndex
+from wear_events import WearEvents
+from wears import WearsFunctions, WearsIndex
+
+HOUSES = ['Hermes', 'Guerlain', 'Chanel', 'Frederic Malle', 'Serge Lutens', 'Creed', "L'Artisan Parfumeur"]
+TYPES = ['Floral Aldehyde', 'Leather', 'Citrus Aromatic', 'Oriental Spicy', 'Chypre', 'Woody Aromatic']
+BOTTLE_SIZES = [10, 30, 50, 75, 100, 125, 200, 275]
+
+
+def make_catalog(n_fragrances, seed=0):
+    """A clean catalog like validation.validate returns, with n_fragrances rows."""
+    rng = np.random.default_rng(seed)
+    price = rng.integers(50, 500, n_fragrances).astype(float)
+    ml = rng.choice(BOTTLE_SIZES, n_fragrances).astype(float)
+    types = rng.choice(TYPES, n_fragrances)
+    df = pd.DataFrame({
+        'House': rng.choice(HOUSES, n_fragrances),
+        'Fragrance': [f'Fragrance {i}' for i in range(n_fragrances)],
+        '$': price,
+        'mL': ml,
+        'My notes': [f'Notes for fragrance {i}, smells of iris and leather.' for i in range(n_fragrances)],
+        'Score out of 100': rng.integers(20, 107, n_fragrances).astype(float),
+        'Type': types,
+        'Performance (1-10)': rng.integers(1, 11, n_fragrances).astype(float),
+        'Scent (1-10)*': rng.integers(1, 11, n_fragrances).astype(float),
+        'Perfumer': [f'Perfumer {i}' for i in rng.integers(0, max(n_fragrances // 5, 1), n_fragrances)],
+    })
+    df['Retail $/mL'] = df['$'] / df['mL']
+    df['First_Word_Type'] = df['Type'].str.split().str[0]
+    return df
+
+
+def wear_sheet_names(n_years):
+    """'Wears for 2021-2022' followed by one sheet per year, like the workbook."""
+    return ['Wears for 2021-2022'] + [f'Wears for {year}' for year in range(2023, 2023 + n_years - 1)]
+
+
+def make_wears(n_rows, n_years=3, seed=0):
+    """A wears table like read_wears returns: n_rows rows spread over n_years "Wears for" sheets."""
+    rng = np.random.default_rng(seed)
+    sheets = wear_sheet_names(n_years)
+    n_fragrances = max(n_rows // n_years, 1)
+    fragrance = np.arange(n_rows) % n_fragrances
+    ml = rng.choice(BOTTLE_SIZES, n_fragrances)
+    backups = rng.choice([0, 0, 0, 1, 2], n_fragrances)
+    return pd.DataFrame({
+        'Fragrance': [f'Fragrance {i}' for i in fragrance],
+        'House': np.array(HOUSES)[fragrance % len(HOUSES)],
+        'mL': ml[fragrance],
+        'Nose': 'Someone',
+        'Notes': 'iris, leather',
+        'Wears': rng.integers(1, 30, n_rows),
+        'Backups': backups[fragrance],
+        'sheet_name': [sheets[i] for i in np.minimum(np.arange(n_rows) // n_fragrances, n_years - 1)],
+    })
+
+
+def write_workbook(path, catalog, wears_df):
+    """Write both tables into one xlsx with the real workbook's sheet names, for the excel parsers."""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        catalog.drop(columns=['Retail $/mL', 'First_Word_Type']).to_excel(
+            writer, sheet_name=loader.CATALOG_SHEET, index=False)
+        for sheet_name, sheet_df in wears_df.groupby('sheet_name'):
+            sheet_df.drop(columns='sheet_name').to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+def measure(func, repeat):
+    """Median seconds over repeat calls after one warm up call, and the peak traced memory of one call in MB."""
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak / 1e6
+
+
+def run_size(n_rows, n_years, repeat, xlsx_max):
+    wears_df = make_wears(n_rows, n_years)
+    catalog = make_catalog(max(n_rows // n_years, 1))
+    frag = wears_df['Fragrance'].iloc[len(wears_df) // 2]
+    engine = FilterEngine(catalog, ['Fragrance', 'House', 'Perfumer', 'Type'])
+    selections = {'House': ['Hermes'], 'Type': [TYPES[0]]}
+
+    def fresh_index():
+        # built directly, WearsIndex.of would return the memoized one
+        return WearsIndex(wears_df)
+
+    def plot_wears():
+        _, _, _, plot_df, ml_start = WearsFunctions.sum_wears(wears_df, frag)
+        return WearsFunctions.plot_wears(plot_df, ml_start)
+
+    def cumulative_wears_plot():
+        FIGURES.clear()
+        return WearsFunctions.cumulative_wears_plot(frag, wears_df)
+
+    def fresh_events():
+        # built directly, WearEvents.of would return the memoized one
+        return WearEvents(WearsIndex.of(wears_df))
+
+    def all_wears_plot():
+        FIGURES.clear()
+        return WearsFunctions.all_wears_plot(frag, wears_df)
+
+    def old_filter_df():
+        filtered_df = catalog.copy()
+        for key, values in selections.items():
+            filtered_df = filtered_df[filtered_df[key].isin(values)]
+        return filtered_df
+
+    search_index = SearchIndex(catalog)
+    similar_index = SimilarityIndex(catalog)
+    similar_frag = catalog['Fragrance'].iloc[len(catalog) // 2]
+    cube = AggregateCube(catalog, wears_df)
+    index = WearsIndex.of(wears_df)
+    # every other tracked fragrance on its own atomizer, the rest on the default
+    profiles = AtomizerProfiles(overrides={frag: (10, 3) for frag in index.totals.index[::2]})
+    ledger = SpendLedger.build(catalog, wears_df, profiles)
+    # every tenth row spelled in lower case and every other row with no wears, for validate() to fix
+    dirty_wears = wears_df.assign(
+        Fragrance=np.where(np.arange(len(wears_df)) % 10 == 0, wears_df['Fragrance'].str.lower(), wears_df['Fragrance']),
+        Wears=np.where(np.arange(len(wears_df)) % 2 == 0, wears_df['Wears'], 0),
+    )
+    fills_args = (
+        index.starting_ml.to_numpy() / 2, index.starting_ml.to_numpy(),
+        index.bottle_ml.to_numpy(), index.backups.to_numpy() + 1,
+    )
+    cases = [
+        ('validate (clean)', lambda: validation.validate(catalog, wears_df)),
+        ('validate (with fixes)', lambda: validation.validate(catalog, dirty_wears)),
+        ('WearsIndex build', fresh_index),
+        ('sum_wears', lambda: WearsFunctions.sum_wears(wears_df, frag)),
+        ('plot_wears', plot_wears),
+        ('WearEvents build', fresh_events),
+        ('yearly rollup slice', lambda: WearEvents.of(wears_df).slice(frag, 'yearly')),
+        ('cumulative_wears_plot (cold)', cumulative_wears_plot),
+        ('all_wears_plot (cold)', all_wears_plot),
+        ('all_wears_plot (cached)', lambda: WearsFunctions.all_wears_plot(frag, wears_df)),
+        ('project_all', lambda: WearsFunctions.project_all(wears_df, catalog)),
+        ('SpendLedger (defaults)', lambda: SpendLedger.build(catalog, wears_df, AtomizerProfiles())),
+        ('SpendLedger (profiles)', lambda: SpendLedger.build(catalog, wears_df, profiles)),
+        ('ledger values (all)', lambda: ledger.values('Remaining mL', index.totals.index)),
+        ('plot_bottles', lambda: WearsFunctions.build_bottle(0.5, 100)),
+        ('plot_bottle_stack', lambda: WearsFunctions.build_bottle_stack((100, 100, 100), (0, 40, 100), 100)),
+        ('list_mult_bottles', lambda: WearsFunctions.list_mult_bottles(50, 300, wears_df.iloc[:1].assign(Backups=2))),
+        ('bottle_fills (all)', lambda: WearsFunctions.bottle_fills(*fills_args)),
+        ('filter_df (copy + isin)', old_filter_df),
+        ('filter_df (FilterEngine)', lambda: catalog[engine.mask(selections)]),
+        ('filter options (FilterEngine)', lambda: engine.options(selections)),
+        ('SearchIndex build', lambda: SearchIndex(catalog)),
+        ('search (typo)', lambda: search_index.search('fragance 4', 10)),
+        ('search (house)', lambda: search_index.search('guerlain', 10)),
+        ('SimilarityIndex build', lambda: SimilarityIndex(catalog)),
+        ('similarity (one fragrance)', lambda: similar_index.similarity(similar_frag)),
+        ('neighbours (cached)', lambda: similar_index.neighbours(similar_frag)),
+        ('AggregateCube build', lambda: AggregateCube(catalog, wears_df)),
+        ('cube view (House x Type)', lambda: cube.view(['House', 'Type'])),
+        ('cube view (sliced)', lambda: cube.view(['Year'], where={'House': ['Hermes']})),
+    ]
+
+    if n_rows <= xlsx_max:
+        tmp_dir = tempfile.mkdtemp()
+        workbook = os.path.join(tmp_dir, 'bench.xlsx')
+        write_workbook(workbook, catalog, wears_df)
+        cases += [
+            ('parse_catalog (xlsx)', lambda: loader.parse_catalog(workbook)),
+            ('read_excel (all sheets)', lambda: pd.read_excel(workbook, sheet_name=None)),
+            ('parse_wears (xlsx)', lambda: WearsFunctions.parse_wears(workbook, workers=1)),
+            ('parse_wears (xlsx, parallel)', lambda: WearsFunctions.parse_wears(workbook)),
+            ('read_wears (parquet)', lambda: (loader.clear_memo(), WearsFunctions.read_wears(workbook))),
+            ('read_wears (memo)', lambda: WearsFunctions.read_wears(workbook)),
+        ]
+
+    results = []
+    for name, func in cases:
+        seconds, peak_mb = measure(func, repeat)
+        results.append({'rows': n_rows, 'case': name, 'ms': seconds * 1000, 'peak_mb': peak_mb})
+        print(f"{n_rows:>9} {name:<32} {seconds * 1000:>10.2f} ms {peak_mb:>9.1f} MB", flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000],
+                        help='wear table rows to benchmark')
+    parser.add_argument('--years', type=int, default=3, help='number of "Wears for" sheets')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case, the median is reported')
+    parser.add_argument('--xlsx-max', type=int, default=20_000,
+                        help='largest size to also write and parse as xlsx (writing xlsx is slow)')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    # keep the parquet files for the synthetic workbooks out of the app's cache
+    loader.CACHE_DIR = tempfile.mkdtemp()
+
+    print(f"{'rows':>9} {'case':<32} {'median':>13} {'peak':>12}")
+    results = []
+    for n_rows in args.sizes:
+        results += run_size(n_rows, args.years, args.repeat, args.xlsx_max)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+How much of a bottle a wear uses, and what the collection cost and has left, per fragrance.
+
+Atomizers differ: a decant's sprayer puts out less per spray than a bottle's, and some
+fragrances only take a spray or two. So sprays per mL and sprays per wear are set per fragrance
+in the atomizer profiles file, one line per fragrance that isn't the default:
+
+    Fragrance,Sprays per mL,Sprays per Wear
+    *,12,4
+    Cuir Beluga,10,3
+    Mitsouko,,2
+
+An empty cell keeps the default, and the '*' line changes the default for every fragrance. The
+file is optional; without it every fragrance uses DEFAULT_SPRAYS_PER_ML and DEFAULT_SPRAYS_PER_WEAR.
+Everything computed from the profiles is cached per profiles version, so an edited file is
+picked up on the next rerun.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+import loader
+import schema
+
+ATOMIZERS_FILE = os.environ.get('CLUBSMELL_ATOMIZERS_FILE', os.path.join(loader.BASE_DIR, 'atomizers.csv'))
+PROFILE_COLUMNS = ['Fragrance', 'Sprays per mL', 'Sprays per Wear']
+
+log = logging.getLogger(__name__)
+
+# Fragrance of the line setting the default
+DEFAULT_FRAGRANCE = '*'
+
+# 12 sprays per mL, 4 sprays per wear: 3 wears per mL
+DEFAULT_SPRAYS_PER_ML = float(os.environ.get('CLUBSMELL_SPRAYS_PER_ML', 12))
+DEFAULT_SPRAYS_PER_WEAR = float(os.environ.get('CLUBSMELL_SPRAYS_PER_WEAR', 4))
+
+LEDGER_COLUMNS = [
+    'Fragrance', 'Sprays per mL', 'Sprays per Wear', 'mL per Wear', 'Wears', 'Bottles', 'Starting mL',
+    'Used mL', 'Remaining mL', 'Retail $/mL', 'Cost per Wear', 'Spend', 'Effective Cost per Wear',
+    'Used Value', 'Remaining Value',
+]
+
+
+def _positive(value, what):
+    value = float(value)
+    if not value > 0 or not np.isfinite(value):
+        raise ValueError(f"{what} must be a positive number, got {value}")
+    return value
+
+
+class AtomizerProfiles:
+    """
+    Sprays per mL and sprays per wear of every fragrance.
+
+    Attributes:
+        sprays_per_ml (float): Default sprays per mL.
+        sprays_per_wear (float): Default sprays per wear.
+        overrides (dict): Fragrance -> (sprays per mL, sprays per wear), for the fragrances that
+            don't use the defaults.
+        version (str): Hash of all of the above, part of the cache key of what is computed from them.
+    """
+
+    def __init__(self, sprays_per_ml=None, sprays_per_wear=None, overrides=None):
+        self.sprays_per_ml = _positive(DEFAULT_SPRAYS_PER_ML if sprays_per_ml is None else sprays_per_ml, 'Sprays per mL')
+        self.sprays_per_wear = _positive(DEFAULT_SPRAYS_PER_WEAR if sprays_per_wear is None else sprays_per_wear, 'Sprays per Wear')
+        self.overrides = {
+            frag: (_positive(per_ml, f'Sprays per mL of {frag}'), _positive(per_wear, f'Sprays per Wear of {frag}'))
+            for frag, (per_ml, per_wear) in (overrides or {}).items()
+        }
+        self.version = hashlib.sha1(json.dumps(
+            [self.sprays_per_ml, self.sprays_per_wear, sorted(self.overrides.items())]
+        ).encode()).hexdigest()[:12]
+
+    @staticmethod
+    def read(path=ATOMIZERS_FILE):
+        """
+        Read an atomizer profiles file (see the top of this module).
+
+        Raises:
+            ValueError: A line has a value that isn't a positive number.
+        """
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        default = {}
+        settings = {}
+        for line, row in enumerate(rows, start=2):
+            frag = (row.get('Fragrance') or '').strip()
+            if not frag:
+                continue
+            try:
+                values = {
+                    column: float(row[column]) for column in PROFILE_COLUMNS[1:] if (row.get(column) or '').strip()
+                }
+            except ValueError as e:
+                raise ValueError(f"{path} line {line}: {e}") from None
+            if frag == DEFAULT_FRAGRANCE:
+                default.update(values)
+            else:
+                settings.setdefault(frag, {}).update(values)
+        sprays_per_ml = default.get('Sprays per mL', DEFAULT_SPRAYS_PER_ML)
+        sprays_per_wear = default.get('Sprays per Wear', DEFAULT_SPRAYS_PER_WEAR)
+        return AtomizerProfiles(sprays_per_ml, sprays_per_wear, {
+            frag: (values.get('Sprays per mL', sprays_per_ml), values.get('Sprays per Wear', sprays_per_wear))
+            for frag, values in settings.items()
+        })
+
+    @staticmethod
+    def _read_or_default(path):
+        if not os.path.exists(path):
+            return AtomizerProfiles()
+        try:
+            return AtomizerProfiles.read(path)
+        except (OSError, ValueError) as e:
+            # like a workbook that fails to parse, a bad edit shouldn't take the app down
+            log.warning("Reading atomizer profiles failed, using the defaults: %r", e)
+            return AtomizerProfiles()
+
+    @staticmethod
+    def current(path=ATOMIZERS_FILE):
+        """The profiles in path, read again only when the file changes (one os.stat per call)."""
+        try:
+            stat = os.stat(path)
+            key = (path, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            key = (path, None)
+        return loader.memoize('atomizers', key, lambda: AtomizerProfiles._read_or_default(path))
+
+    def of(self, frag):
+        """Sprays per mL and sprays per wear of one fragrance."""
+        return self.overrides.get(frag, (self.sprays_per_ml, self.sprays_per_wear))
+
+    def arrays(self, fragrances):
+        """
+        Sprays per mL and sprays per wear of many fragrances at once.
+
+        Returns:
+            tuple: Two float arrays aligned with fragrances.
+        """
+        fragrances = pd.Index(fragrances, dtype=object)
+        if not self.overrides:
+            return np.full(len(fragrances), self.sprays_per_ml), np.full(len(fragrances), self.sprays_per_wear)
+        overrides = pd.DataFrame.from_dict(self.overrides, orient='index').reindex(fragrances)
+        sprays_per_ml = overrides[0].fillna(self.sprays_per_ml).to_numpy(dtype=float)
+        sprays_per_wear = overrides[1].fillna(self.sprays_per_wear).to_numpy(dtype=float)
+        return sprays_per_ml, sprays_per_wear
+
+    def ml_used(self, fragrances, wears):
+        """mL used up by wears of each of fragrances (arrays of the same length)."""
+        sprays_per_ml, sprays_per_wear = self.arrays(fragrances)
+        return np.asarray(wears, dtype=float) * sprays_per_wear / sprays_per_ml
+
+
+class SpendLedger:
+    """
+    What each fragrance costs per wear, what the collection cost and what is left of it.
+
+    Built from the catalog prices, the wears and the atomizer profiles for the whole collection
+    at once, as numpy arrays, once per data version (wear log updates included) and profiles
+    version. One row per catalog fragrance in catalog order, then the tracked fragrances missing
+    from the catalog (without prices). Columns, see LEDGER_COLUMNS:
+      - Sprays per mL, Sprays per Wear, mL per Wear: from the atomizer profiles.
+      - Wears: all time, wear log included, 0 if not tracked.
+      - Bottles, Starting mL, Used mL, Remaining mL: bottles owned (1 + backups) and their mL,
+        for the tracked fragrances only. Remaining mL goes negative when the profiles underestimate.
+      - Retail $/mL: from the catalog.
+      - Cost per Wear: Retail $/mL x mL per Wear, what one wear uses up.
+      - Spend: Retail $/mL x Starting mL, what the bottles owned cost to date.
+      - Effective Cost per Wear: Spend / Wears, what each wear so far has cost. Missing until worn.
+      - Used Value, Remaining Value: Retail $/mL x Used mL and x Remaining mL (not below 0).
+
+    Attributes:
+        frame (pd.DataFrame): The ledger, read-only.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self._positions = pd.Index(frame['Fragrance'].to_numpy(dtype=object))
+
+    @staticmethod
+    def build(catalog, wears_df, profiles):
+        # imported here, wears.py uses this module
+        from wears import WearsIndex
+        index = WearsIndex.of(wears_df)
+
+        tracked = pd.Index(index.totals.index, dtype=object)
+        if catalog is not None:
+            catalog = catalog.drop_duplicates(subset='Fragrance')
+            listed = pd.Index(catalog['Fragrance'].to_numpy(dtype=object))
+            fragrances = listed.append(tracked[~tracked.isin(listed)])
+            retail = np.concatenate([
+                catalog['Retail $/mL'].to_numpy(dtype=float), np.full(len(fragrances) - len(listed), np.nan)
+            ])
+        else:
+            fragrances = tracked
+            retail = np.full(len(fragrances), np.nan)
+
+        sprays_per_ml, sprays_per_wear = profiles.arrays(fragrances)
+        wears = index.totals.reindex(fragrances).fillna(0).to_numpy(dtype=float)
+        starting_ml = index.starting_ml.reindex(fragrances).to_numpy(dtype=float)
+        bottles = index.backups.reindex(fragrances).to_numpy(dtype=float) + 1
+        # wears x sprays per wear / sprays per mL, in the order sum_wears has always used
+        used_ml = np.where(np.isnan(starting_ml), np.nan, wears * sprays_per_wear / sprays_per_ml)
+        remaining_ml = starting_ml - used_ml
+        spend = retail * starting_ml
+        with np.errstate(divide='ignore', invalid='ignore'):
+            effective = np.where(wears > 0, spend / wears, np.nan)
+
+        return SpendLedger(schema.freeze(pd.DataFrame({
+            'Fragrance': fragrances,
+            'Sprays per mL': sprays_per_ml,
+            'Sprays per Wear': sprays_per_wear,
+            'mL per Wear': sprays_per_wear / sprays_per_ml,
+            'Wears': wears,
+            'Bottles': bottles,
+            'Starting mL': starting_ml,
+            'Used mL': used_ml,
+            'Remaining mL': remaining_ml,
+            'Retail $/mL': retail,
+            'Cost per Wear': retail * sprays_per_wear / sprays_per_ml,
+            'Spend': spend,
+            'Effective Cost per Wear': effective,
+            'Used Value': retail * used_ml,
+            'Remaining Value': retail * np.maximum(remaining_ml, 0),
+        }, columns=LEDGER_COLUMNS)))
+
+    @staticmethod
+    def of(catalog, wears_df, profiles=None, version=None):
+        """
+        The ledger of catalog (None for no prices) and wears_df, built once per data version and profiles version.
+
+        Args:
+            catalog (pd.DataFrame): The catalog, or None.
+            wears_df (pd.DataFrame): DataFrame containing fragrance wear data.
+            profiles (AtomizerProfiles, optional): Defaults to AtomizerProfiles.current().
+            version (str, optional): Version of catalog, e.g. Dataset.version or Snapshot.version.
+                Defaults to a hash of its Fragrance and Retail $/mL columns.
+        """
+        # imported here, wears.py uses this module
+        from wears import WearsIndex
+        if profiles is None:
+            profiles = AtomizerProfiles.current()
+        if version is None:
+            version = loader.frame_fingerprint(catalog, ['Fragrance', 'Retail $/mL'])
+        key = (version, WearsIndex.of(wears_df).data_version, profiles.version)
+        return loader.memoize('ledger', key, lambda: SpendLedger.build(catalog, wears_df, profiles))
+
+    def __contains__(self, frag):
+        return frag in self._positions
+
+    def values(self, column, fragrances):
+        """One column for many fragrances, as a float array aligned with them (NaN where not in the ledger)."""
+        positions = self._positions.get_indexer(pd.Index(fragrances, dtype=object))
+        values = self.frame[column].to_numpy(dtype=float)[positions]
+        values[positions < 0] = np.nan
+        return values
+
+    def row(self, frag):
+        """The ledger row of one fragrance as a dict, None if it isn't in the ledger."""
+        if frag not in self._positions:
+            return None
+        return self.frame.iloc[self._positions.get_loc(frag)].to_dict()
+
+    def totals(self):
+        """Collection totals: Wears, Starting mL, Used mL, Remaining mL, Spend, Used Value and Remaining Value."""
+        columns = ['Wears', 'Starting mL', 'Used mL', 'Remaining mL', 'Spend', 'Used Value', 'Remaining Value']
+        return {column: float(np.nansum(self.frame[column].to_numpy(dtype=float))) for column in columns}
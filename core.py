@@ -0,0 +1,44 @@
+"""
+Where app.py and its pages get their data: a snapshot or the watched workbooks.
+
+Importing this module is free. The snapshot reader or the workbook watcher (and with them the
+table and index modules) is imported on the first call of data(), and only the one in use.
+"""
+import datetime
+import os
+
+
+def data(info=None):
+    """
+    The data for this rerun.
+
+    CLUBSMELL_SNAPSHOT=1 (or a snapshot directory) serves a snapshot from snapshot.py read-only,
+    otherwise the workbooks are watched by watcher.py: an edit is parsed (once, see loader.py) in a
+    background thread and reruns get the latest fully built version without waiting for it.
+
+    Args:
+        info (dict, optional): Filled in for the profiler (see RerunProfiler.stage): 'source',
+            'snapshot' or 'workbooks', 'version', and 'data', 'built' if this call built or loaded
+            the data (a cold start, or it waited for another session's build) or 'reused'.
+
+    Returns:
+        tuple: A tuple containing the following elements, exactly one of them None:
+            - Snapshot: The snapshot being served.
+            - Dataset: The latest Dataset of the workbooks.
+    """
+    started = datetime.datetime.now()
+    snapshot_dir = os.environ.get('CLUBSMELL_SNAPSHOT')
+    if snapshot_dir:
+        from snapshot import Snapshot, SNAPSHOT_DIR
+        snapshot = Snapshot.load(SNAPSHOT_DIR if snapshot_dir == '1' else snapshot_dir)
+        _describe(info, 'snapshot', snapshot.version, snapshot.loaded >= started)
+        return snapshot, None
+    from watcher import DATA
+    dataset = DATA.current()
+    _describe(info, 'workbooks', dataset.version, dataset.built >= started)
+    return None, dataset
+
+
+def _describe(info, source, version, built):
+    if info is not None:
+        info.update(source=source, version=version, data='built' if built else 'reused')
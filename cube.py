@@ -0,0 +1,171 @@
+import datetime
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import loader
+import schema
+from consumption import AtomizerProfiles, SpendLedger
+from wear_events import WearEvents
+from wears import WearsIndex
+
+# dimension -> catalog column. Type is the type's first word, as in the sidebar's Type filter.
+DIMENSIONS = {'House': 'House', 'Perfumer': 'Perfumer', 'Type': 'First_Word_Type', 'Year': None}
+# label of fragrances with no value for a dimension
+UNKNOWN = 'Unknown'
+
+# per fragrance measures, stored as sums (and counts for the means) so cells roll up by adding
+SUMS = ['Fragrances', 'Wears', 'Remaining mL', 'Spend',
+        'Score sum', 'Score n', 'Scent sum', 'Scent n', 'Performance sum', 'Performance n']
+MEANS = {'Mean Score': 'Score', 'Mean Scent': 'Scent', 'Mean Performance': 'Performance'}
+MEASURES = ['Fragrances', 'Mean Score', 'Mean Scent', 'Mean Performance', 'Wears', 'Remaining mL', 'Spend']
+# catalog columns the cube is built from
+CATALOG_COLUMNS = ['Fragrance', 'Retail $/mL', 'Score out of 100', 'Scent (1-10)*', 'Performance (1-10)'] + [
+    column for column in DIMENSIONS.values() if column]
+# measures by year: wears are dated, scores, spend and bottles aren't
+YEAR_SUMS = ['Fragrances worn', 'Wears']
+YEAR_MEASURES = YEAR_SUMS
+
+
+class AggregateCube:
+    """
+    Collection totals by House x Perfumer x Type x Year, for the analytics page.
+
+    One base cell per combination that has fragrances, holding sums and counts, then every
+    roll-up (each subset of the dimensions) summed from the base cells once at build time.
+    A pivot is a lookup of the roll-up for its dimensions, plus a filter of its rows when the
+    page slices on a value.
+
+    Measures by House, Perfumer and Type (Year not grouped):
+      - Fragrances: catalog entries.
+      - Mean Score, Mean Scent, Mean Performance: over the fragrances that have one.
+      - Wears: all time, wear log included.
+      - Remaining mL: of the tracked fragrances, from the SpendLedger (atomizer profiles applied).
+      - Spend: of the tracked fragrances, Retail $/mL times the mL of the bottles owned (SpendLedger).
+    With Year grouped only the dated measures exist: Wears that year (WearEvents yearly rollup)
+    and Fragrances worn that year. Wears of fragrances missing from the catalog are left out.
+
+    Attributes:
+        today (datetime.date): Date the yearly wears are for.
+        years (list): Years with wears, oldest first.
+    """
+
+    def __init__(self, catalog, wears_df, today=None, profiles=None, version=None):
+        if today is None:
+            today = datetime.date.today()
+        self.today = today
+        static = [dim for dim, column in DIMENSIONS.items() if column]
+
+        catalog = catalog.drop_duplicates(subset='Fragrance')
+        fragrances = pd.Index(catalog['Fragrance'].to_numpy(dtype=object))
+        index = WearsIndex.of(wears_df)
+        ledger = SpendLedger.of(catalog, wears_df, profiles, version)
+
+        cells = pd.DataFrame({
+            dim: catalog[DIMENSIONS[dim]].astype(object).fillna(UNKNOWN).astype(str).to_numpy() for dim in static
+        })
+        cells['Fragrances'] = 1
+        cells['Wears'] = index.totals.reindex(fragrances).fillna(0).to_numpy(dtype=float)
+        cells['Remaining mL'] = ledger.values('Remaining mL', fragrances)
+        cells['Spend'] = ledger.values('Spend', fragrances)
+        for name, column in [('Score', 'Score out of 100'), ('Scent', 'Scent (1-10)*'), ('Performance', 'Performance (1-10)')]:
+            values = catalog[column].to_numpy(dtype=float)
+            cells[f'{name} sum'] = values
+            cells[f'{name} n'] = ~np.isnan(values)
+
+        yearly = WearEvents.of(wears_df, today).rollup('yearly')
+        yearly = yearly[yearly['Wears'] > 0]
+        positions = fragrances.get_indexer(yearly['Fragrance'].astype(object))
+        in_catalog = positions >= 0
+        year_cells = cells[static].iloc[positions[in_catalog]].reset_index(drop=True)
+        year_cells['Year'] = yearly['Period'].dt.year.to_numpy()[in_catalog]
+        year_cells['Fragrances worn'] = 1
+        year_cells['Wears'] = yearly['Wears'].to_numpy(dtype=float)[in_catalog]
+        self.years = sorted(year_cells['Year'].unique().tolist())
+
+        # every subset of the dimensions, keyed in DIMENSIONS order
+        self._cuboids = {}
+        for size in range(len(DIMENSIONS) + 1):
+            for dims in itertools.combinations(DIMENSIONS, size):
+                source, sums = (year_cells, YEAR_SUMS) if 'Year' in dims else (cells, SUMS)
+                self._cuboids[dims] = schema.freeze(AggregateCube._roll_up(source, list(dims), sums))
+
+    @staticmethod
+    def _roll_up(cells, dims, sums):
+        if not dims:
+            return pd.DataFrame({measure: [cells[measure].sum()] for measure in sums})
+        # min_count=1: a group with no remaining mL (none tracked) stays missing rather than 0
+        return cells.groupby(dims, sort=True)[sums].sum(min_count=1).reset_index()
+
+    @staticmethod
+    def of(catalog, wears_df, today=None, version=None):
+        """
+        The cube of catalog and wears_df, built once per data version (wear log updates included), day and atomizer profiles.
+
+        Args:
+            catalog (pd.DataFrame): The catalog.
+            wears_df (pd.DataFrame): DataFrame containing fragrance wear data.
+            today (datetime.date, optional): Date the yearly wears are for. Defaults to today.
+            version (str, optional): Version of catalog, e.g. Dataset.version or Snapshot.version.
+                Defaults to a hash of the catalog columns the cube reads.
+        """
+        if today is None:
+            today = datetime.date.today()
+        if version is None:
+            version = loader.frame_fingerprint(catalog, CATALOG_COLUMNS)
+        profiles = AtomizerProfiles.current()
+        key = (version, WearsIndex.of(wears_df).data_version, today, profiles.version)
+        return loader.memoize('cube', key, lambda: AggregateCube(catalog, wears_df, today, profiles, version))
+
+    def values(self, dim):
+        """Values of one dimension, sorted."""
+        if dim == 'Year':
+            return self.years
+        return self._cuboids[(dim,)][dim].tolist()
+
+    def measures(self, dims, where=None):
+        """Measures view() has for a grouping and slice: YEAR_MEASURES if either includes Year, else MEASURES."""
+        return YEAR_MEASURES if 'Year' in dims or 'Year' in (where or {}) else MEASURES
+
+    def view(self, dims=(), where=None):
+        """
+        Measures grouped by some dimensions, optionally sliced to some of their values.
+
+        Args:
+            dims (list, optional): Dimensions to group by, any of DIMENSIONS. None for collection totals.
+            where (dict, optional): Dimension -> values to keep, e.g. {'House': ['Guerlain']}. The
+                dimension doesn't have to be grouped by.
+
+        Returns:
+            pd.DataFrame: One row per combination of dims that has fragrances (one row when dims is
+                empty), the dims as columns followed by measures(dims, where).
+        """
+        dims = [dim for dim in DIMENSIONS if dim in dims]
+        where = {dim: values for dim, values in (where or {}).items() if values is not None}
+        key = tuple(dim for dim in DIMENSIONS if dim in dims or dim in where)
+        cells = self._cuboids[key]
+        sums = YEAR_SUMS if 'Year' in key else SUMS
+
+        if where:
+            keep = np.ones(len(cells), dtype=bool)
+            for dim, values in where.items():
+                keep &= cells[dim].isin(list(values)).to_numpy()
+            cells = cells[keep]
+            if len(key) > len(dims):
+                # sliced on dimensions that aren't grouped: add up what's left of them
+                cells = AggregateCube._roll_up(cells, dims, sums)
+
+        view = cells[dims].reset_index(drop=True)
+        if 'Year' in key:
+            for measure in YEAR_MEASURES:
+                view[measure] = cells[measure].to_numpy()
+            return view
+        for measure in MEASURES:
+            if measure in MEANS:
+                name = MEANS[measure]
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    view[measure] = cells[f'{name} sum'].to_numpy(dtype=float) / cells[f'{name} n'].to_numpy(dtype=float)
+            else:
+                view[measure] = cells[measure].to_numpy()
+        return view
@@ -0,0 +1,51 @@
+import loader
+
+
+class FacetIndex:
+    """
+    Sidebar filter options for the catalog, built once per catalog version.
+
+    For each filter (House, Perfumer, Type) holds the filter values and, for each value, the
+    fragrances it matches, in the same order the sidebar got from unique() over the catalog.
+    'All Fragrances' is the catalog ordered best to worst by score. A filter change is then a
+    dict lookup rather than a scan of the catalog.
+
+    Attributes:
+        df (pd.DataFrame): The catalog the index was built from.
+        options (dict): Filter name -> list of values to pick from.
+        fragrances (dict): Filter name -> {value: list of fragrances}.
+        best_to_worst (list): Scored fragrances, highest score first.
+    """
+
+    FILTERS = ['House', 'Perfumer', 'Type', 'All Fragrances']
+    # catalog column behind each filter
+    COLUMNS = {'House': 'House', 'Perfumer': 'Perfumer', 'Type': 'First_Word_Type'}
+
+    def __init__(self, df):
+        self.df = df
+        self.options = {}
+        self.fragrances = {}
+        for filter_name, column in FacetIndex.COLUMNS.items():
+            groups = df.dropna(subset=[column]).groupby(column, sort=False)['Fragrance'].unique()
+            self.options[filter_name] = groups.index.tolist()
+            self.fragrances[filter_name] = {value: fragrances.tolist() for value, fragrances in groups.items()}
+
+        df_sort_score = df.dropna(subset=["Score out of 100"]).sort_values(by='Score out of 100', ascending=False)
+        self.best_to_worst = df_sort_score["Fragrance"].unique().tolist()
+
+        self._positions = df.reset_index(drop=True).groupby('Fragrance', sort=False).indices
+
+    @staticmethod
+    def of(df):
+        """Get the index for the catalog df, building it only the first time this frame is seen."""
+        return loader.memoize('facets', id(df), lambda: FacetIndex(df))
+
+    def fragrances_for(self, filter_name, value=None):
+        """Fragrances matching a filter value, or every scored fragrance for 'All Fragrances'."""
+        if filter_name == 'All Fragrances':
+            return self.best_to_worst
+        return self.fragrances[filter_name].get(value, [])
+
+    def selection(self, fragrance):
+        """Catalog rows for one fragrance, like df.query("Fragrance == @fragrance") without the scan."""
+        return self.df.iloc[self._positions.get(fragrance, [])]
@@ -0,0 +1,62 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class FigureCache:
+    """
+    A small thread-safe LRU cache for plotly figures.
+
+    Figures are built lazily: get() only calls build on a miss, so a chart that is never
+    rendered is never constructed. Cached figures are shared between reruns and sessions,
+    so callers must not modify what they get back.
+
+    Attributes:
+        maxsize (int): Number of figures kept before the least recently used is evicted.
+        hits (int): Lookups served from the cache.
+        misses (int): Lookups that had to build.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Get the figure for key, building and caching it on a miss.
+
+        Args:
+            key (tuple): Hashable key. Include the data version of everything the figure depends on.
+            build (callable): Called with no arguments to build the figure.
+
+        Returns:
+            Whatever build returns, usually a plotly figure.
+        """
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return self._figures[key]
+            self.misses += 1
+
+        figure = build()
+        with self._lock:
+            self._figures[key] = figure
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.maxsize:
+                self._figures.popitem(last=False)
+        return figure
+
+    def clear(self):
+        """Drop every cached figure."""
+        with self._lock:
+            self._figures.clear()
+
+    def __len__(self):
+        return len(self._figures)
+
+
+FIGURES = FigureCache(int(os.environ.get('CLUBSMELL_FIGURE_CACHE_SIZE', 256)))
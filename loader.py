@@ -0,0 +1,407 @@
+import concurrent.futures
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import threading
+import zipfile
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+
+import schema
+
+# Streamlit reruns app.py from the top on every widget change, but imported modules stay
+# loaded. So anything memoized here survives reruns, and the parquet cache survives restarts.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOG_FILE = os.path.join(BASE_DIR, 'Silly_Fragrance_excel.xlsx')
+WEARS_FILE = os.path.join(BASE_DIR, 'Copy of Silly_Fragrance_excel.xlsx')
+CATALOG_SHEET = 'Insane Persons Sheet'
+
+CACHE_DIR = os.environ.get('CLUBSMELL_CACHE_DIR', os.path.join(BASE_DIR, '.clubsmell_cache'))
+
+# bump this when the parsing/cleaning code changes, so stale parquet files are not reused
+CACHE_SCHEMA = 3
+
+# rows per DataFrame chunk when streaming a workbook
+CHUNK_ROWS = 10_000
+
+# Sheets are parsed on a process pool (openpyxl is pure python, so threads wouldn't run it in
+# parallel) once the workbooks of a read add up to this many bytes. Below it starting the
+# workers costs more than it saves.
+PARALLEL_MIN_BYTES = int(os.environ.get('CLUBSMELL_PARALLEL_MIN_BYTES', 2_000_000))
+# worker processes, 0 for one per CPU
+PARSE_WORKERS = int(os.environ.get('CLUBSMELL_PARSE_WORKERS', 0))
+
+_memo = {}
+_memo_lock = threading.Lock()
+# one per memo name, held while building it, so sessions missing together build it once
+_build_locks = {}
+
+# counters for the profiling panel: in-process memo hits/misses and where cached frames came from
+stats = {'memo_hits': 0, 'memo_misses': 0, 'parquet_reads': 0, 'excel_parses': 0}
+
+
+def fingerprint(*paths):
+    """
+    Hash the identity of one or more source files.
+
+    Uses path, modification time and size rather than the file contents, so checking
+    whether the cache is still valid costs one os.stat per file.
+
+    Args:
+        *paths (str): Source files the cached data is built from.
+
+    Returns:
+        str: A short hex digest that changes whenever any of the files change.
+    """
+    h = hashlib.sha1(f"schema={CACHE_SCHEMA}".encode())
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"|{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}".encode())
+    return h.hexdigest()[:16]
+
+
+def frame_fingerprint(df, columns=None):
+    """
+    Hash the contents of a frame, for memo keys of what is built from a frame without a file version.
+
+    Costs a pass over the values, so callers that have the data version at hand (Dataset.version,
+    Snapshot.version) pass that instead.
+
+    Args:
+        df (pd.DataFrame): The frame, or None.
+        columns (list, optional): Only hash these columns.
+
+    Returns:
+        str: A short hex digest of the values and column names, None for no frame.
+    """
+    if df is None:
+        return None
+    if columns is not None:
+        df = df[columns]
+    h = hashlib.sha1('|'.join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+def memoize(name, version, build):
+    """
+    In-process memo, in the spirit of st.cache_data but usable outside Streamlit.
+
+    Only the latest version is kept per name, so an edited workbook replaces the old
+    entry instead of piling up copies. The returned object is shared: don't mutate it.
+
+    Safe to call from concurrent sessions: on a miss the first caller builds while the
+    others wait for it and get its value, instead of every session building its own copy.
+
+    Args:
+        name (str): Cache slot, e.g. 'catalog' or 'wears'.
+        version (str): Data version, usually from fingerprint().
+        build (callable): Called with no arguments on a miss.
+
+    Returns:
+        The cached value for (name, version).
+    """
+    with _memo_lock:
+        hit = _memo.get(name)
+        build_lock = _build_locks.setdefault(name, threading.RLock())
+    if hit is not None and hit[0] == version:
+        stats['memo_hits'] += 1
+        return hit[1]
+
+    with build_lock:
+        # built by another session while this one waited
+        with _memo_lock:
+            hit = _memo.get(name)
+        if hit is not None and hit[0] == version:
+            stats['memo_hits'] += 1
+            return hit[1]
+
+        stats['memo_misses'] += 1
+        value = build()
+        with _memo_lock:
+            _memo[name] = (version, value)
+    return value
+
+
+def clear_memo():
+    """Drop every in-process entry. The parquet files on disk are left alone."""
+    with _memo_lock:
+        _memo.clear()
+
+
+def _arrow_safe(df):
+    """
+    Make object columns storable as parquet.
+
+    Excel columns can mix types (fragrances called 1932 next to text names, '#DIV/0!' next
+    to floats). Arrow wants one type per column, so mixed object columns become strings,
+    keeping missing values missing.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        values = df[col].dropna()
+        if values.map(type).nunique() > 1 or (len(values) and not isinstance(values.iloc[0], str)):
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v)).astype(object)
+    return df
+
+
+def read_parquet(path):
+    """Read a frame written from excel data back, with missing text as NaN like read_excel gives (parquet returns None)."""
+    df = pd.read_parquet(path)
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def _write_parquet(df, path, name):
+    """Atomically write df to path and remove older cache files for the same name."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        # read-only deploys still work, they just keep parsing excel on a cold start
+        return
+
+    for file in os.listdir(CACHE_DIR):
+        stale = os.path.join(CACHE_DIR, file)
+        if file.startswith(f"{name}-") and file.endswith('.parquet') and stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def cached_frame(name, source, build, columns=None):
+    """
+    Serve a DataFrame built from an excel file, parsing the excel at most once per version.
+
+    Lookup order is the in-process memo, then the parquet cache in CACHE_DIR, then build().
+    A cold start is a single excel parse; a warm rerun touches no excel at all.
+
+    Args:
+        name (str): Cache name, used for the memo slot and the parquet file name.
+        source (str): Excel file the frame is built from, used for the version hash.
+        build (callable): Parses the excel file and returns the DataFrame.
+        columns (dict, optional): Schema to compact the parsed frame to, see schema.compact().
+
+    Returns:
+        pd.DataFrame: The cached frame, read-only (schema.freeze) and shared between reruns and sessions.
+    """
+    version = fingerprint(source)
+
+    def load():
+        path = os.path.join(CACHE_DIR, f"{name}-{version}.parquet")
+        if os.path.exists(path):
+            try:
+                df = read_parquet(path)
+                stats['parquet_reads'] += 1
+                return schema.freeze(df)
+            except Exception:
+                # half written or from another pyarrow version, just rebuild it
+                pass
+        stats['excel_parses'] += 1
+        df = _arrow_safe(build())
+        if columns is not None:
+            df = schema.compact(df, columns)
+        _write_parquet(df, path, name)
+        return schema.freeze(df)
+
+    return memoize(name, version, load)
+
+
+# text read_excel treats as missing by default (its na_values)
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+
+def _cell(value):
+    # same conversions as read_excel: whole floats become ints, NA_STRINGS are missing
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value in NA_STRINGS:
+        return None
+    return value
+
+
+def _chunk_frame(rows, names):
+    df = pd.DataFrame(rows, columns=names)
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def iter_sheet_chunks(excel_file, sheets, columns=None, chunk_size=CHUNK_ROWS):
+    """
+    Stream sheets of a workbook as DataFrame chunks, reading only the wanted sheets and columns.
+
+    The workbook is opened in openpyxl's read-only mode, which parses sheets row by row as
+    they are iterated instead of loading the whole workbook, and other sheets are never
+    parsed. The first row of a sheet is its header. Columns without a header are skipped,
+    as are rows with none of the wanted columns filled in.
+
+    Args:
+        excel_file (str): Path to the workbook.
+        sheets (callable): Called with each sheet name, True to read the sheet.
+        columns (iterable, optional): Header names to keep. Defaults to every named column.
+        chunk_size (int, optional): Most rows per chunk.
+
+    Yields:
+        tuple: (sheet name, pd.DataFrame) in workbook order, the chunk's columns in header order.
+    """
+    # imported here, only a cold cache or an edited workbook needs it
+    import openpyxl
+
+    wanted = None if columns is None else set(columns)
+    workbook = openpyxl.load_workbook(excel_file, read_only=True, data_only=True, keep_links=False)
+    try:
+        for sheet_name in workbook.sheetnames:
+            if not sheets(sheet_name):
+                continue
+            sheet = workbook[sheet_name]
+            # saved dimensions can be missing or wrong, read until the last row instead
+            sheet.reset_dimensions()
+            rows = sheet.iter_rows(values_only=True)
+
+            positions, names = [], []
+            for i, name in enumerate(next(rows, ())):
+                name = None if name is None else str(name)
+                if name is not None and (wanted is None or name in wanted) and name not in names:
+                    positions.append(i)
+                    names.append(name)
+
+            chunk = []
+            chunks = 0
+            for row in rows:
+                values = [_cell(row[i]) if i < len(row) else None for i in positions]
+                if all(value is None for value in values):
+                    continue
+                chunk.append(values)
+                if len(chunk) == chunk_size:
+                    yield sheet_name, _chunk_frame(chunk, names)
+                    chunk = []
+                    chunks += 1
+            # a sheet with no rows still gives one (empty) chunk, with its columns
+            if chunk or not chunks:
+                yield sheet_name, _chunk_frame(chunk, names)
+    finally:
+        workbook.close()
+
+
+def read_sheet(excel_file, sheet_name, columns=None):
+    """One sheet of a workbook as a DataFrame, streamed with iter_sheet_chunks()."""
+    chunks = [chunk for _, chunk in iter_sheet_chunks(excel_file, lambda name: name == sheet_name, columns)]
+    if not chunks:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found in {excel_file}")
+    return pd.concat(chunks, ignore_index=True)
+
+
+def sheet_names(excel_file):
+    """Names of a workbook's sheets, in workbook order, without loading the workbook."""
+    try:
+        with zipfile.ZipFile(excel_file) as archive:
+            root = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        return [sheet.get('name') for sheet in root.iter() if sheet.tag.rsplit('}', 1)[-1] == 'sheet']
+    except KeyError:
+        # workbook part stored somewhere unusual, let openpyxl find it
+        import openpyxl
+        workbook = openpyxl.load_workbook(excel_file, read_only=True, keep_links=False)
+        try:
+            return workbook.sheetnames
+        finally:
+            workbook.close()
+
+
+# one pool shared by the reads running at the same time (e.g. both workbooks on a cold start),
+# shut down when the last of them finishes so idle workers don't hold memory
+_pool = None
+_pool_users = 0
+_pool_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _parse_pool(workers):
+    global _pool, _pool_users
+    with _pool_lock:
+        if _pool is None:
+            # a forkserver child starts from a clean process with pandas and openpyxl imported, rather
+            # than forking the app with its threads, or starting from scratch (spawn) on every read
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['loader', 'openpyxl'])
+            else:
+                context = multiprocessing.get_context('spawn')
+            _pool = concurrent.futures.ProcessPoolExecutor(workers, mp_context=context)
+        _pool_users += 1
+        pool = _pool
+    try:
+        yield pool
+    finally:
+        with _pool_lock:
+            _pool_users -= 1
+            idle = _pool_users == 0
+            if idle:
+                _pool = None
+        if idle:
+            pool.shutdown(wait=False)
+
+
+def _read_sheet_job(job):
+    return read_sheet(*job)
+
+
+def read_sheets(jobs, workers=None):
+    """
+    Read several sheets, from one workbook or several, in parallel worker processes.
+
+    Each worker streams one sheet with read_sheet(). Reads of small workbooks (PARALLEL_MIN_BYTES)
+    and reads with a single worker run in this process, one sheet after the other.
+
+    Args:
+        jobs (list): (excel_file, sheet_name, columns) tuples, columns as for read_sheet().
+        workers (int, optional): Worker processes, 1 to read serially. Defaults to PARSE_WORKERS.
+
+    Returns:
+        list: One DataFrame per job, in the order of jobs.
+    """
+    if workers is None:
+        workers = PARSE_WORKERS or os.cpu_count() or 1
+    jobs = [(excel_file, sheet_name, None if columns is None else list(columns)) for excel_file, sheet_name, columns in jobs]
+    size = sum(os.path.getsize(excel_file) for excel_file in {job[0] for job in jobs})
+    if workers <= 1 or size < PARALLEL_MIN_BYTES:
+        return [_read_sheet_job(job) for job in jobs]
+    with _parse_pool(workers) as pool:
+        return list(pool.map(_read_sheet_job, jobs))
+
+
+def parse_catalog(excel_file=CATALOG_FILE, columns=schema.CATALOG):
+    """
+    Read the 'Insane Persons Sheet' catalog.
+
+    Rows are kept as they are in the sheet, cleaning (empty rows, rows missing House or
+    Fragrance, 'Retail $/mL' and 'First_Word_Type') is validation.validate()'s.
+
+    Args:
+        excel_file (str): Path to the catalog workbook.
+        columns (iterable, optional): Columns to read, None for all of them. Defaults to the schema's.
+
+    Returns:
+        pd.DataFrame: The catalog rows.
+    """
+    return read_sheets([(excel_file, CATALOG_SHEET, columns)])[0]
+
+
+def load_catalog(excel_file=CATALOG_FILE):
+    """Cached version of parse_catalog(), compacted to schema.CATALOG."""
+    return cached_frame('catalog', excel_file, lambda: parse_catalog(excel_file), schema.CATALOG)
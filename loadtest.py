@@ -0,0 +1,215 @@
+"""
+Load test: simulated users clicking through the dashboard at the same time.
+
+Starts the app with `streamlit run` (or uses one already running with --url) and opens
+--sessions websocket connections to it, the same connection a browser tab makes. Each session
+reruns the script --reruns times, every time changing one sidebar widget at random: the filter,
+the house/perfumer/type, the fragrance or the search box. Rerun latency is the time from sending
+the new widget values to the server reporting the script finished.
+
+    python loadtest.py                                   # 10 sessions, 20 reruns each
+    python loadtest.py --sessions 50 --reruns 40 --json load.json
+    python loadtest.py --url http://localhost:8501       # an app that is already running
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.websocket import websocket_connect
+
+import loader
+
+APP_FILE = os.path.join(loader.BASE_DIR, 'app.py')
+SEARCH_QUERIES = ['hermes', 'iris', 'leathr', 'malle', 'rose', 'guerlain', 'oud', 'vetiver']
+
+
+class Session:
+    """
+    One simulated browser tab.
+
+    Keeps the widgets the last run showed (id -> element) and the values the session has set,
+    and sends them all with every rerun, as the browser does.
+
+    Attributes:
+        latencies (list): Seconds per rerun, the first (cold) run included.
+        errors (list): Exception messages the app showed.
+    """
+
+    def __init__(self, url, seed):
+        self.url = url
+        self.rng = random.Random(seed)
+        self.latencies = []
+        self.errors = []
+        self._widgets = {}
+        self._states = {}
+        self._cache = {}
+        self._ws = None
+
+    async def connect(self):
+        self._ws = await websocket_connect(self.url.replace('http', 'ws', 1) + '/_stcore/stream')
+
+    def close(self):
+        self._ws.close()
+
+    async def rerun(self):
+        """Send the current widget values and wait for the run to finish."""
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        msg.rerun_script.page_script_hash = ''
+        for state in self._states.values():
+            msg.rerun_script.widget_states.widgets.append(state)
+        started = time.perf_counter()
+        await self._ws.write_message(msg.SerializeToString(), binary=True)
+
+        widgets = {}
+        while True:
+            payload = await self._ws.read_message()
+            if payload is None:
+                raise ConnectionError('the app closed the connection')
+            forward = ForwardMsg()
+            forward.ParseFromString(payload)
+            if forward.ref_hash:
+                forward = self._cache[forward.ref_hash]
+            elif forward.hash:
+                self._cache[forward.hash] = forward
+            kind = forward.WhichOneof('type')
+            if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                element_kind = element.WhichOneof('type')
+                if element_kind in ('selectbox', 'text_input'):
+                    widget = getattr(element, element_kind)
+                    widgets[widget.id] = (element_kind, widget)
+                elif element_kind == 'exception':
+                    self.errors.append(element.exception.message)
+            elif kind == 'script_finished':
+                break
+        self.latencies.append(time.perf_counter() - started)
+
+        self._widgets = widgets
+        # widgets that are gone (e.g. the house box after switching to All Fragrances) reset
+        self._states = {key: state for key, state in self._states.items() if key in widgets}
+
+    def change_something(self):
+        """Set one widget to a random value."""
+        key = self.rng.choice(sorted(self._widgets))
+        kind, widget = self._widgets[key]
+        state = self._states.get(key)
+        if state is None:
+            state = BackMsg().rerun_script.widget_states.widgets.add()
+            state.id = key
+            self._states[key] = state
+        if kind == 'text_input':
+            # clear the box half of the time, so the filters get used too
+            state.string_value = '' if state.string_value else self.rng.choice(SEARCH_QUERIES)
+        elif len(widget.options):
+            state.int_value = self.rng.randrange(len(widget.options))
+
+    async def run(self, reruns):
+        await self.connect()
+        try:
+            await self.rerun()
+            for _ in range(reruns):
+                self.change_something()
+                await self.rerun()
+        finally:
+            self.close()
+
+
+def percentile(values, pct):
+    """Nearest rank percentile, pct in 0-100."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+async def load(url, sessions, reruns, seed):
+    users = [Session(url, seed + i) for i in range(sessions)]
+    started = time.perf_counter()
+    await asyncio.gather(*(user.run(reruns) for user in users))
+    elapsed = time.perf_counter() - started
+
+    first = [user.latencies[0] for user in users]
+    warm = [latency for user in users for latency in user.latencies[1:]]
+    return {
+        'sessions': sessions,
+        'reruns': len(first) + len(warm),
+        'seconds': elapsed,
+        'reruns_per_second': (len(first) + len(warm)) / elapsed,
+        'first_run_p50_ms': statistics.median(first) * 1000,
+        'p50_ms': percentile(warm, 50) * 1000,
+        'p90_ms': percentile(warm, 90) * 1000,
+        'p99_ms': percentile(warm, 99) * 1000,
+        'max_ms': max(warm) * 1000,
+        'errors': sorted({error for user in users for error in user.errors}),
+    }
+
+
+def start_app(port):
+    """Run app.py with streamlit on port and wait until it answers."""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', APP_FILE, '--server.headless', 'true',
+         '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f'http://localhost:{port}'
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(url + '/_stcore/health', timeout=1)
+            return process, url
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('streamlit exited before the app started')
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('the app did not start within 30 seconds')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=10, help='concurrent sessions')
+    parser.add_argument('--reruns', type=int, default=20, help='reruns per session after the first')
+    parser.add_argument('--url', default=None, help='app to test, instead of starting one')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default=None, help='also write the results to this file')
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_app(free_port())
+    try:
+        results = asyncio.run(load(url.rstrip('/'), args.sessions, args.reruns, args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(f"{results['sessions']} sessions, {results['reruns']} reruns in {results['seconds']:.1f} s "
+          f"({results['reruns_per_second']:.1f} reruns/s)")
+    print(f"first run p50 {results['first_run_p50_ms']:.0f} ms")
+    print(f"rerun p50 {results['p50_ms']:.0f} ms, p90 {results['p90_ms']:.0f} ms, "
+          f"p99 {results['p99_ms']:.0f} ms, max {results['max_ms']:.0f} ms")
+    for error in results['errors']:
+        print(f"error: {error}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,170 @@
 import streamlit as st
 from streamlit.errors import StreamlitAPIException
 import pandas as pd
+import numpy as np
+
+
+# engines by (id(df), columns); each engine keeps its df alive, so an id can't be reused while cached
+_engines = {}
+
+
+class FilterEngine:
+    """
+    Cascading filters over a dataframe, computed with boolean masks instead of filtered copies.
+
+    ...
+
+    Each filter column is factorized once into integer codes (values numbered in order of first
+    appearance, missing values included). A selection is a boolean row mask built with one lookup
+    into a per-column table, and the options of every filter (the values left by all the *other*
+    filters) come from prefix/suffix ANDs of those masks, so all option sets cost one pass over
+    the rows instead of a copy and N-1 isin passes per filter.
+
+    Attributes
+    ----------
+    df : DataFrame
+        The dataframe on which filters are applied.
+    columns : list
+        Filter column names, in display order.
+
+    Methods
+    -------
+    mask(selections, except_filter=None):
+        Boolean row mask for the selections, ignoring one filter.
+    options(selections):
+        Values left for every filter, in order of first appearance.
+    reconcile(selections, require_selection=False):
+        Drops selections no longer available, optionally defaulting empty filters to their first option.
+    """
+
+    def __init__(self, df, columns):
+        self.df = df
+        self.columns = list(columns)
+        self._codes = {}
+        self._values = {}
+        for column in self.columns:
+            codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+            self._codes[column] = codes
+            self._values[column] = pd.Index(uniques)
+
+    @staticmethod
+    def of(df, columns):
+        """Engine for df and columns, reused while the same frame is passed in on each rerun."""
+        key = (id(df), tuple(columns))
+        engine = _engines.get(key)
+        if engine is None or engine.df is not df:
+            if len(_engines) >= 8:
+                _engines.pop(next(iter(_engines)))
+            engine = _engines[key] = FilterEngine(df, columns)
+        return engine
+
+    def _selected_codes(self, column, values):
+        codes = self._values[column].get_indexer(list(values))
+        return codes[codes >= 0]
+
+    def _column_mask(self, column, codes):
+        table = np.zeros(len(self._values[column]), dtype=bool)
+        table[codes] = True
+        return table[self._codes[column]]
+
+    def _option_codes(self, selected):
+        # selected: filter name -> array of selected codes, empty means no filtering
+        all_rows = np.ones(len(self.df), dtype=bool)
+        masks = [self._column_mask(column, selected[column]) if len(selected[column]) else all_rows
+                 for column in self.columns]
+
+        # prefix[i] is the AND of the masks before filter i, suffix[i] of the masks from filter i on
+        prefix = [all_rows]
+        for mask in masks:
+            prefix.append(prefix[-1] & mask)
+        suffix = [all_rows]
+        for mask in reversed(masks):
+            suffix.append(suffix[-1] & mask)
+        suffix.reverse()
+
+        return {column: pd.unique(self._codes[column][prefix[i] & suffix[i + 1]])
+                for i, column in enumerate(self.columns)}
+
+    def mask(self, selections, except_filter=None):
+        """
+        Boolean row mask for the selections.
+
+        Parameters
+        ----------
+            selections : dict
+                Filter name -> list of selected values. Empty or missing means no filtering.
+            except_filter : str, optional
+                The filter name that should be excluded from the current filtering operation.
+
+        Returns
+        -------
+            ndarray
+                True for the rows that pass every other filter.
+        """
+        mask = np.ones(len(self.df), dtype=bool)
+        for column in self.columns:
+            values = selections.get(column)
+            if column != except_filter and values:
+                mask &= self._column_mask(column, self._selected_codes(column, values))
+        return mask
+
+    def options(self, selections):
+        """
+        Options of every filter given the selections of the others, in one pass.
+
+        Parameters
+        ----------
+            selections : dict
+                Filter name -> list of selected values.
+
+        Returns
+        -------
+            dict
+                Filter name -> list of values, in order of first appearance among the remaining rows.
+        """
+        selected = {column: self._selected_codes(column, selections.get(column) or []) for column in self.columns}
+        return {column: self._values[column].take(codes).tolist()
+                for column, codes in self._option_codes(selected).items()}
+
+    def reconcile(self, selections, require_selection=False):
+        """
+        Make the selections consistent with each other.
+
+        Filters are checked in order, like display_filters used to do across reruns: selected values
+        no longer among a filter's options are dropped and, with require_selection, an empty filter
+        takes its first option (what a selectbox shows). After any change the options are recomputed,
+        until nothing changes.
+
+        Parameters
+        ----------
+            selections : dict
+                Filter name -> list of selected values.
+            require_selection : bool, optional
+                Default empty filters to their first option.
+
+        Returns
+        -------
+            tuple
+                The reconciled selections and the options for each filter.
+        """
+        selected = {column: self._selected_codes(column, selections.get(column) or []) for column in self.columns}
+        while True:
+            option_codes = self._option_codes(selected)
+            changed = False
+            for column in self.columns:
+                valid = selected[column][np.isin(selected[column], option_codes[column])]
+                if not len(valid) and require_selection and len(option_codes[column]):
+                    valid = option_codes[column][:1]
+                if not np.array_equal(valid, selected[column]):
+                    selected[column] = valid
+                    changed = True
+                    break
+            if not changed:
+                break
+
+        selections = {column: self._values[column].take(selected[column]).tolist() for column in self.columns}
+        options = {column: self._values[column].take(codes).tolist() for column, codes in option_codes.items()}
+        return selections, options
 
 
 class DynamicFilters:
@@ -42,6 +206,7 @@ class DynamicFilters:
         self.df = df
         self.filters_name = filters_name
         self.filters = {filter_name: [] for filter_name in filters}
+        self.engine = FilterEngine.of(df, filters)
         self.check_state()
 
     def check_state(self):
@@ -65,17 +230,39 @@ class DynamicFilters:
             DataFrame
                 Filtered dataframe.
         """
-        filtered_df = self.df.copy()
-        for key, values in st.session_state[self.filters_name].items():
-            if key != except_filter and values:
-                filtered_df = filtered_df[filtered_df[key].isin(values)]
-        return filtered_df
+        return self.df[self.engine.mask(st.session_state[self.filters_name], except_filter)]
+
+    def widget_key(self, filter_name):
+        """Session state key of the selectbox for filter_name."""
+        return f"{self.filters_name}_{filter_name}"
 
     
     def display_filters(self, location=None, num_columns=0, gap="small"):
-        # ... (rest of the method remains the same)
+        """
+        Renders one selectbox per filter.
+
+        The values just picked are read from the widgets' session state before anything is drawn,
+        reconciled in one go by the filter engine, and each selectbox is drawn with its final options,
+        so a change no longer needs st.experimental_rerun() to show up in the other filters. As
+        before, a filter with nothing selected takes its first option.
+
+        Parameters
+        ----------
+            location : str, optional
+                'sidebar', 'columns', or None for the main area.
+            num_columns : int, optional
+                Number of columns when location is 'columns'.
+            gap : str, optional
+                Gap between columns.
+        """
+        selections = dict(st.session_state[self.filters_name])
+        for filter_name in selections:
+            key = self.widget_key(filter_name)
+            if key in st.session_state:
+                selections[filter_name] = [] if st.session_state[key] is None else [st.session_state[key]]
 
-        filters_changed = False
+        selections, options = self.engine.reconcile(selections, require_selection=True)
+        st.session_state[self.filters_name] = selections
 
         # initiate counter and max_value for columns
         if location == 'columns' and num_columns > 0:
@@ -83,25 +270,18 @@ class DynamicFilters:
             max_value = num_columns
             col_list = st.columns(num_columns, gap=gap)
 
-        for filter_name in st.session_state[self.filters_name].keys():
-            filtered_df = self.filter_df(filter_name)
-            options = filtered_df[filter_name].unique().tolist()
-
-            # Remove selected values that are not in options anymore
-            valid_selections = [v for v in st.session_state[self.filters_name][filter_name] if v in options]
-            if valid_selections != st.session_state[self.filters_name][filter_name]:
-                st.session_state[self.filters_name][filter_name] = valid_selections
-                filters_changed = True
+        for filter_name in selections:
+            filter_options = options[filter_name]
+            index = 0
+            if selections[filter_name]:
+                # get_indexer rather than list.index, so a selected NaN is found too
+                index = int(pd.Index(filter_options).get_indexer(selections[filter_name][:1])[0])
 
             if location == 'sidebar':
-                selected = st.selectbox(f"Select {filter_name}", options,
-                                        index=options.index(st.session_state[self.filters_name][filter_name][0])
-                                        if st.session_state[self.filters_name][filter_name] else 0)
+                st.selectbox(f"Select {filter_name}", filter_options, index=index, key=self.widget_key(filter_name))
             elif location == 'columns' and num_columns > 0:
                 with col_list[counter - 1]:
-                    selected = st.selectbox(f"Select {filter_name}", options,
-                                            index=options.index(st.session_state[self.filters_name][filter_name][0])
-                                            if st.session_state[self.filters_name][filter_name] else 0)
+                    st.selectbox(f"Select {filter_name}", filter_options, index=index, key=self.widget_key(filter_name))
 
                 # increase counter and reset to 1 if max_value is reached
                 counter += 1
@@ -109,16 +289,8 @@ class DynamicFilters:
                 if counter == 0:
                     counter = 1
             else:
-                selected = st.selectbox(f"Select {filter_name}", options,
-                                        index=options.index(st.session_state[self.filters_name][filter_name][0])
-                                        if st.session_state[self.filters_name][filter_name] else 0)
-
-            if selected != st.session_state[self.filters_name][filter_name]:
-                st.session_state[self.filters_name][filter_name] = [selected]
-                filters_changed = True
+                st.selectbox(f"Select {filter_name}", filter_options, index=index, key=self.widget_key(filter_name))
 
-        if filters_changed:
-            st.experimental_rerun()  # Use st.experimental_rerun() instead of st.rerun()
     def display_df(self, **kwargs):
         """Renders the filtered dataframe in the main area."""
         # Display filtered DataFrame
@@ -0,0 +1,106 @@
+import streamlit as st
+
+import core
+from profiler import RerunProfiler
+
+# collection-wide numbers, each chart and table a slice of the aggregate cube in cube.py
+# (built once per data version, so changing the grouping doesn't touch the raw tables)
+
+st.set_page_config(
+  page_title="Insane Fragrance Dashboard - Analytics",
+  page_icon=":lipstick:",
+  layout="wide"
+)
+
+profiler=RerunProfiler.for_rerun()
+
+# same data as the fragrance pages, see core.py
+with profiler.stage("data") as info:
+    data_snapshot, dataset=core.data(info)
+# the cube's table modules come with the data, see app.py
+from cube import AggregateCube, DIMENSIONS
+df=data_snapshot.catalog if data_snapshot else dataset.catalog
+wears_df=data_snapshot.wears if data_snapshot else dataset.wears
+
+if data_snapshot is None:
+    with profiler.stage("wear log") as info:
+        info["log_entries"]=dataset.wears_index.sync_log()
+
+with profiler.stage("cube") as info:
+    cube=AggregateCube.of(df, wears_df, version=data_snapshot.version if data_snapshot else dataset.version)
+
+# SIDEBAR: grouping, measure and slice
+group_by=st.sidebar.multiselect('Group by (up to 2):', options=list(DIMENSIONS), default=['House'], max_selections=2)
+where={}
+for dim in DIMENSIONS:
+    values=st.sidebar.multiselect(f'Only these {dim} values:', options=cube.values(dim), key=f"where_{dim}")
+    if values:
+        where[dim]=values
+measure=st.sidebar.selectbox('Measure:', options=cube.measures(group_by, where))
+
+st.header("Collection Analytics")
+
+totals=cube.view()
+t1,t2,t3,t4=st.columns(4)
+with t1:
+    st.subheader("Fragrances")
+    st.subheader(f"{totals['Fragrances'].iloc[0]}")
+with t2:
+    st.subheader("Total Wears")
+    st.subheader(f"{totals['Wears'].iloc[0]:.0f}")
+with t3:
+    st.subheader("Remaining mL")
+    st.subheader(f"{totals['Remaining mL'].iloc[0]:.0f}")
+with t4:
+    st.subheader("Spend")
+    st.subheader(f"${totals['Spend'].iloc[0]:,.0f}")
+
+st.markdown("---")
+
+with profiler.stage("view") as info:
+    view=cube.view(group_by, where)
+    info["rows"]=len(view)
+
+if not len(view):
+    st.subheader("Nothing matches these filters.")
+elif not group_by:
+    value=view[measure].iloc[0]
+    st.subheader(f"{measure}: {value:,.2f}" if measure in ("Mean Score", "Mean Scent", "Mean Performance") else f"{measure}: {value:,.0f}")
+elif len(group_by)==1:
+    import plotly.express as px
+    dim=group_by[0]
+    ordered=view.sort_values(by=measure, ascending=False, kind="stable")
+    fig=px.bar(ordered, x=dim, y=measure, title=f"{measure} by {dim}")
+    fig.update_xaxes(type="category")
+    profiler.plotly_chart(fig, "analytics bar", use_container_width=True)
+else:
+    import plotly.express as px
+    rows, columns=group_by
+    pivot=view.pivot(index=rows, columns=columns, values=measure)
+    fig=px.imshow(pivot, aspect="auto", color_continuous_scale="Purples", title=f"{measure} by {rows} and {columns}")
+    fig.update_xaxes(type="category")
+    fig.update_yaxes(type="category")
+    profiler.plotly_chart(fig, "analytics heatmap", use_container_width=True)
+
+st.dataframe(
+    view,
+    column_config={
+        "Mean Score": st.column_config.NumberColumn(format="%.1f"),
+        "Mean Scent": st.column_config.NumberColumn(format="%.2f"),
+        "Mean Performance": st.column_config.NumberColumn(format="%.2f"),
+        "Wears": st.column_config.NumberColumn(format="%.0f"),
+        "Remaining mL": st.column_config.NumberColumn(format="%.0f"),
+        "Spend": st.column_config.NumberColumn(format="$%.0f"),
+    },
+    hide_index=True,
+    use_container_width=True
+)
+
+small_text_style = "font-size: small;"
+st.write('<div style="{}">Means are over the fragrances that have a value. Remaining mL and Spend count tracked fragrances only: '
+         'Remaining mL uses each fragrance\'s sprays per mL and per wear (atomizers.csv), Spend is the retail price per mL '
+         'times the mL of the bottles owned (backups included). '
+         'Year groups wears by the year they were worn, so only Wears and Fragrances worn can be split by year.</div>'.format(small_text_style),
+         unsafe_allow_html=True)
+
+profiler.finish()
@@ -0,0 +1,92 @@
+import contextlib
+import datetime
+import json
+import os
+import time
+
+import streamlit as st
+
+import loader
+from figure_cache import FIGURES
+
+# Opt in with CLUBSMELL_PROFILE=1 or ?profile=1 in the url. Each profiled rerun gets a debug
+# panel at the bottom of the page and a line in the JSONL log.
+PROFILE_LOG_FILE = os.environ.get('CLUBSMELL_PROFILE_LOG', os.path.join(loader.BASE_DIR, 'profile.jsonl'))
+
+
+class RerunProfiler:
+    """
+    Times the stages of one app.py rerun.
+
+    When disabled every method is a cheap pass-through, so app.py can call it unconditionally.
+
+    Attributes:
+        enabled (bool): Whether this rerun is profiled.
+        stages (list): One dict per stage: 'stage', 'ms' and whatever the stage recorded (rows, payload_bytes...).
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.stages = []
+        self._started = time.perf_counter()
+        self._cache_before = self._cache_counters()
+
+    @staticmethod
+    def for_rerun():
+        """A profiler for this rerun, enabled by the CLUBSMELL_PROFILE env var or the profile query param."""
+        enabled = os.environ.get('CLUBSMELL_PROFILE') == '1' or st.query_params.get('profile') == '1'
+        return RerunProfiler(enabled)
+
+    def _cache_counters(self):
+        counters = dict(loader.stats)
+        counters['figure_hits'] = FIGURES.hits
+        counters['figure_misses'] = FIGURES.misses
+        return counters
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Time a block of the rerun.
+
+        Yields a dict the block can add details to, e.g. info['rows'] = len(df).
+        """
+        info = {}
+        if not self.enabled:
+            yield info
+            return
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.stages.append({'stage': name, 'ms': round((time.perf_counter() - start) * 1000, 3), **info})
+
+    def plotly_chart(self, fig, name, **kwargs):
+        """st.plotly_chart, timed and with the size of the figure json when profiling."""
+        with self.stage(f"plotly_chart: {name}") as info:
+            if self.enabled:
+                info['payload_bytes'] = len(fig.to_json())
+            st.plotly_chart(fig, **kwargs)
+
+    def finish(self):
+        """Show the debug panel and append the rerun to the JSONL log. Does nothing when disabled."""
+        if not self.enabled:
+            return
+        after = self._cache_counters()
+        cache = {key: after[key] - self._cache_before[key] for key in after}
+        total_ms = round((time.perf_counter() - self._started) * 1000, 3)
+
+        with st.expander(f"Debug: rerun took {total_ms:.0f} ms"):
+            st.dataframe(self.stages, use_container_width=True)
+            st.json(cache)
+
+        record = {
+            'time': datetime.datetime.now().isoformat(timespec='seconds'),
+            'total_ms': total_ms,
+            'stages': self.stages,
+            'cache': cache,
+        }
+        try:
+            with open(PROFILE_LOG_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+        except OSError:
+            pass
@@ -0,0 +1,147 @@
+"""
+Column types for the catalog and wears tables, applied once when they are loaded.
+
+Both workbooks come out of read_excel as object and float64/int64 columns, with the same few
+House, Type and sheet names repeated on every row. compact() keeps only the columns the app
+uses and stores repeated text as categoricals (each distinct string stored once, rows hold
+small integer codes), small numbers as float32 or small ints. The compact frame is
+frozen and memoized by loader.py, so every session shares one read-only copy.
+
+    python schema.py                        # memory per column before and after, for both workbooks
+"""
+import numpy as np
+import pandas as pd
+
+# column -> dtype. Columns not listed are dropped. float32 and the int types are only used
+# when the conversion is lossless, otherwise the column keeps its excel type.
+CATALOG = {
+    'House': 'category',
+    'Fragrance': 'object',
+    '$': 'float32',
+    'mL': 'float32',
+    'Retail $/mL': 'float64',
+    'My notes': 'object',
+    'Score out of 100': 'float32',
+    'Type': 'category',
+    'Performance (1-10)': 'float32',
+    'Scent (1-10)*': 'float32',
+    'Perfumer': 'category',
+    'First_Word_Type': 'category',
+}
+
+WEARS = {
+    'Fragrance': 'category',
+    'House': 'category',
+    'mL': 'int16',
+    'Wears': 'int32',
+    'Backups': 'int8',
+    'sheet_name': 'category',
+}
+
+
+def _coerce(series, dtype):
+    """series as dtype, or unchanged if it doesn't convert without changing a value."""
+    if dtype == 'object' or series.dtype == dtype:
+        return series
+    if dtype == 'category':
+        return series.astype('category')
+    try:
+        converted = series.astype(dtype)
+        lossless = np.array_equal(
+            converted.to_numpy(dtype='float64', na_value=np.nan),
+            series.to_numpy(dtype='float64', na_value=np.nan),
+            equal_nan=True,
+        )
+    except (TypeError, ValueError, OverflowError):
+        return series
+    return converted if lossless else series
+
+
+def compact(df, columns):
+    """
+    Keep only the listed columns, converted to their compact types.
+
+    Args:
+        df (pd.DataFrame): Frame as parsed from excel.
+        columns (dict): Column name -> dtype, e.g. CATALOG or WEARS.
+
+    Returns:
+        pd.DataFrame: A new frame with the same rows and index.
+    """
+    kept = [col for col in df.columns if col in columns]
+    return pd.DataFrame({col: _coerce(df[col], columns[col]) for col in kept}, index=df.index)
+
+
+def _read_only(array):
+    while isinstance(array, np.ndarray):
+        array.flags.writeable = False
+        array = array.base
+
+
+def freeze(df):
+    """
+    Make the frame's buffers read-only, so writing into a shared frame raises instead of
+    silently changing it for every session. Copies (df.copy(), df.iloc[...].copy()) are writable.
+
+    Returns:
+        pd.DataFrame: df itself.
+    """
+    for col in df.columns:
+        values = df[col].array
+        if isinstance(values, pd.Categorical):
+            _read_only(values.codes)
+        else:
+            # numpy backed columns, or the data and mask of nullable columns
+            for name in ('_ndarray', '_data', '_mask'):
+                _read_only(getattr(values, name, None))
+    return df
+
+
+def memory_report(before, after):
+    """
+    Memory per column of a frame before and after compact().
+
+    Args:
+        before (pd.DataFrame): Frame as parsed.
+        after (pd.DataFrame): The compacted frame.
+
+    Returns:
+        pd.DataFrame: 'Column', 'Before dtype', 'After dtype' ('dropped' if not kept), 'Before KB',
+            'After KB' and 'Saved %', one row per column of before plus a 'Total' row.
+    """
+    before_bytes = before.memory_usage(deep=True, index=False)
+    after_bytes = after.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'Column': before.columns,
+        'Before dtype': before.dtypes.astype(str).to_numpy(),
+        'After dtype': [str(after[col].dtype) if col in after.columns else 'dropped' for col in before.columns],
+        'Before KB': before_bytes.to_numpy() / 1024,
+        'After KB': after_bytes.reindex(before.columns, fill_value=0).to_numpy() / 1024,
+    })
+    total = pd.DataFrame({
+        'Column': ['Total'], 'Before dtype': [''], 'After dtype': [''],
+        'Before KB': [report['Before KB'].sum()], 'After KB': [report['After KB'].sum()],
+    })
+    report = pd.concat([report, total], ignore_index=True)
+    report['Saved %'] = 100 * (1 - report['After KB'] / report['Before KB'])
+    return report
+
+
+def main():
+    # imported here, loader and wears import this module
+    import loader
+    from wears import WearsFunctions
+
+    for name, parse, columns in [
+        ('catalog', loader.parse_catalog, CATALOG),
+        ('wears', WearsFunctions.parse_wears, WEARS),
+    ]:
+        # every named column, as read before the schema projects them away
+        raw = parse(loader.CATALOG_FILE if name == 'catalog' else loader.WEARS_FILE, None)
+        print(f"{name}: {len(raw)} rows")
+        print(memory_report(raw, compact(raw, columns)).to_string(index=False, float_format='{:.1f}'.format))
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+import loader
+
+# catalog column -> how much a match in it counts. Names count most, the review text least
+# (it is long, so it shares a few trigrams with almost any query).
+FIELDS = {'Fragrance': 3.0, 'House': 2.0, 'Perfumer': 2.0, 'Type': 1.0, 'My notes': 0.5}
+
+# share of the query's trigrams a fragrance has to contain to be a match
+MIN_OVERLAP = 0.5
+
+
+def normalize(texts):
+    """Lowercase ascii letters and digits separated by single spaces: accents and punctuation are dropped."""
+    return (
+        pd.Series(texts, dtype=object).fillna('').astype(str)
+        .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+        .str.lower().str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+    )
+
+
+def normalize_query(text):
+    """normalize() for one string, without the pandas overhead."""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()
+
+
+def _trigrams(texts, docs):
+    """
+    Distinct (trigram code, doc) pairs of padded texts, vectorized over all of them.
+
+    Every text becomes ' text ', so word starts and ends are trigrams too. A trigram is coded
+    as its three bytes in one int: b0 << 16 | b1 << 8 | b2.
+    """
+    padded = (' ' + texts + ' ').to_numpy(dtype=object)
+    lengths = np.fromiter((len(text) for text in padded), dtype=np.int64, count=len(padded))
+    chars = np.frombuffer(''.join(padded).encode('ascii'), dtype=np.uint8).astype(np.int64)
+    owner = np.repeat(docs, lengths)
+    if len(chars) < 3:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    codes = chars[:-2] << 16 | chars[1:-1] << 8 | chars[2:]
+    inside = owner[:-2] == owner[2:]
+    return codes[inside], owner[:-2][inside]
+
+
+class SearchIndex:
+    """
+    Trigram index over the catalog for ranked fuzzy and prefix search.
+
+    Each fragrance's Fragrance, House, Perfumer, Type and notes are split into trigrams, stored as
+    one array of (trigram, fragrance) pairs sorted by trigram, so a query trigram's fragrances are
+    a contiguous range found by binary search. A query scores each fragrance by the weighted share
+    of its trigrams found in it, so typos and partial words still match. Names starting with the
+    query are ranked first.
+
+    Attributes:
+        df (pd.DataFrame): The catalog the index was built from.
+        fragrances (np.ndarray): Fragrance names, the documents of the index.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        catalog = df.drop_duplicates(subset='Fragrance')
+        self.fragrances = catalog['Fragrance'].astype(str).to_numpy(dtype=object)
+        docs = np.arange(len(catalog))
+
+        keys, weights = [], []
+        for column, weight in FIELDS.items():
+            if column not in catalog.columns:
+                continue
+            codes, owner = _trigrams(normalize(catalog[column].to_numpy()), docs)
+            field_keys = np.unique(codes * len(docs) + owner)
+            keys.append(field_keys)
+            weights.append(np.full(len(field_keys), weight))
+        keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+
+        # per (trigram, fragrance): weights of the fields it is in, summed
+        self._weights = np.bincount(inverse, weights=np.concatenate(weights))
+        self._codes = keys // max(len(docs), 1)
+        self._docs = keys % max(len(docs), 1)
+        self._max_weight = sum(FIELDS.values())
+
+        names = normalize(self.fragrances).to_numpy(dtype=object)
+        self._name_order = np.argsort(names, kind='stable')
+        self._sorted_names = names[self._name_order]
+
+    @staticmethod
+    def of(df):
+        """Get the index for the catalog df, building it only the first time this frame is seen."""
+        # the memo holds the index and so the frame: its id can't be reused while it is the key
+        return loader.memoize('search', id(df), lambda: SearchIndex(df))
+
+    def _prefix_matches(self, query):
+        """Positions of the fragrances whose normalized name starts with query."""
+        lo = np.searchsorted(self._sorted_names, query, side='left')
+        hi = np.searchsorted(self._sorted_names, query + '\x7f', side='left')
+        return self._name_order[lo:hi]
+
+    def search(self, query, k=10):
+        """
+        Fragrances best matching query.
+
+        Args:
+            query (str): What was typed, any case, with or without accents.
+            k (int, optional): Most results to return.
+
+        Returns:
+            list: (fragrance, score) tuples, best first. Score is 0-1 for trigram matches, plus 1
+                if the name starts with the query.
+        """
+        query = normalize_query(query)
+        if not query or not len(self.fragrances):
+            return []
+
+        # only a leading space: the last word may still be being typed
+        chars = np.frombuffer((' ' + query).encode('ascii'), dtype=np.uint8).astype(np.int64)
+        query_codes = np.unique(chars[:-2] << 16 | chars[1:-1] << 8 | chars[2:])
+        prefix = self._prefix_matches(query)
+        if not len(query_codes):
+            # one character has no trigram to score by: only names starting with it match
+            return [(frag, 1.0) for frag in self.fragrances[prefix[:k]]]
+
+        scores = np.zeros(len(self.fragrances))
+        hits = np.zeros(len(self.fragrances))
+        starts = np.searchsorted(self._codes, query_codes, side='left')
+        stops = np.searchsorted(self._codes, query_codes, side='right')
+        for start, stop in zip(starts, stops):
+            docs = self._docs[start:stop]
+            scores[docs] += self._weights[start:stop]
+            hits[docs] += 1
+        scores /= max(len(query_codes), 1) * self._max_weight
+
+        matched = (hits > 0) & (hits >= MIN_OVERLAP * len(query_codes))
+        scores[prefix] += 1
+        matched[prefix] = True
+
+        candidates = np.flatnonzero(matched)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        # best score first, then by name
+        candidates = candidates[np.lexsort((self.fragrances[candidates], -scores[candidates]))]
+        return [(self.fragrances[i], float(scores[i])) for i in candidates]
@@ -0,0 +1,153 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import loader
+from search import normalize
+
+# how much each kind of agreement counts towards the similarity of two fragrances
+WEIGHTS = {'House': 1.0, 'Perfumer': 1.5, 'Type': 0.5, 'First_Word_Type': 0.5, 'numbers': 1.0, 'notes': 2.0}
+NUMERIC = ['Scent (1-10)*', 'Performance (1-10)', 'Score out of 100', 'Retail $/mL']
+
+# neighbour lists of catalogs up to this size are all computed when the index is built,
+# bigger catalogs compute (and keep) them on first view
+PRECOMPUTE_MAX = 5_000
+TERMS_PER_FRAGRANCE = 30
+
+STOPWORDS = frozenset("""
+a about after again all also am an and any are as at be been but by can could did do does doing down
+for from had has have he her here him his how i if in into is it its just like me more most my no nor
+not now of off on once only or other our out over own same she so some such than that the their them
+then there these they this those through to too under until up very was we were what when where which
+while who why will with would you your
+""".split())
+
+
+def _codes(series):
+    """Integer codes of a text column, -1 for missing, so matches are one vectorized comparison."""
+    return pd.factorize(normalize(series.to_numpy()).replace('', np.nan))[0]
+
+
+class SimilarityIndex:
+    """
+    "Fragrances like this one": top-k nearest neighbours over the catalog.
+
+    Similarity of two fragrances is a weighted average of
+      - same House, Perfumer, Type and Type family (compared as integer codes),
+      - closeness of Scent, Performance, Score and log Retail $/mL (standardized, missing and
+        non-positive values counted as average), exp(-distance^2 / 2),
+      - cosine similarity of the TF-IDF vectors of their notes, keeping each fragrance's
+        TERMS_PER_FRAGRANCE strongest terms.
+    The features are built once as arrays; a query is a few vectorized passes over the catalog,
+    plus the postings of at most TERMS_PER_FRAGRANCE note terms.
+
+    Attributes:
+        df (pd.DataFrame): The catalog the index was built from.
+        fragrances (np.ndarray): Fragrance names, one per row of the features.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        catalog = df.drop_duplicates(subset='Fragrance')
+        self.fragrances = catalog['Fragrance'].astype(str).to_numpy(dtype=object)
+        self._rows = {frag: i for i, frag in enumerate(self.fragrances)}
+        n = len(catalog)
+
+        self._codes = {column: _codes(catalog[column]) for column in ['House', 'Perfumer', 'Type', 'First_Word_Type']}
+
+        numbers = catalog[NUMERIC].astype(float).to_numpy()
+        # a price of 0 (a gift, a sample) has no log: it counts as missing rather than turning the
+        # column's mean and std, and so every fragrance's price feature, into -inf/NaN
+        prices = numbers[:, -1]
+        numbers[:, -1] = np.log(np.where(prices > 0, prices, np.nan))
+        with np.errstate(invalid='ignore'):
+            numbers = (numbers - np.nanmean(numbers, axis=0)) / np.nanstd(numbers, axis=0)
+        # missing numbers count as average
+        self._numbers = np.nan_to_num(numbers, nan=0.0, posinf=0.0, neginf=0.0)
+
+        self._build_notes(catalog['My notes'], n)
+        self._neighbours = {}
+        self._lock = threading.Lock()
+        if n <= PRECOMPUTE_MAX:
+            for frag in self.fragrances:
+                self.neighbours(frag)
+
+    def _build_notes(self, notes, n):
+        """TF-IDF of the notes, stored both by fragrance (to query) and by term (postings)."""
+        words = normalize(notes.to_numpy()).str.split().explode()
+        words = words[words.notna() & ~words.isin(STOPWORDS)]
+        pairs = pd.DataFrame({'doc': words.index.to_numpy(), 'term': words.to_numpy()})
+        # words.index is the position in notes: normalize() numbers its rows from 0
+        counts = pairs.groupby(['doc', 'term']).size().reset_index(name='tf')
+
+        df_terms = counts.groupby('term')['doc'].size()
+        # terms in one note only can't relate two fragrances, terms in most notes don't tell them apart
+        useful = df_terms[(df_terms >= 2) & (df_terms <= max(n // 2, 2))]
+        counts = counts[counts['term'].isin(useful.index)]
+        idf = np.log(n / useful)
+        counts['w'] = (1 + np.log(counts['tf'].to_numpy())) * idf.reindex(counts['term']).to_numpy()
+        counts = counts.sort_values(['doc', 'w'], ascending=[True, False])
+        counts = counts[counts.groupby('doc').cumcount() < TERMS_PER_FRAGRANCE]
+        counts['w'] /= np.sqrt((counts['w'] ** 2).groupby(counts['doc']).transform('sum'))
+
+        terms = pd.factorize(counts['term'])[0]
+        docs = counts['doc'].to_numpy()
+        weights = counts['w'].to_numpy()
+        # by fragrance: counts is sorted by doc
+        self._doc_ptr = np.searchsorted(docs, np.arange(n + 1))
+        self._doc_terms, self._doc_weights = terms, weights
+        # by term
+        order = np.argsort(terms, kind='stable')
+        self._term_ptr = np.searchsorted(terms[order], np.arange(terms.max(initial=-1) + 2))
+        self._post_docs, self._post_weights = docs[order], weights[order]
+
+    @staticmethod
+    def of(df):
+        """Get the index for the catalog df, building it only the first time this frame is seen."""
+        # the memo holds the index and so the frame: its id can't be reused while it is the key
+        return loader.memoize('similar', id(df), lambda: SimilarityIndex(df))
+
+    def similarity(self, frag):
+        """Similarity (0-1) of every fragrance in the index to frag, in the order of fragrances."""
+        i = self._rows[frag]
+        score = np.zeros(len(self.fragrances))
+        for column, codes in self._codes.items():
+            if codes[i] >= 0:
+                score += WEIGHTS[column] * (codes == codes[i])
+
+        distance = ((self._numbers - self._numbers[i]) ** 2).sum(axis=1)
+        score += WEIGHTS['numbers'] * np.exp(-distance / 2)
+
+        text = np.zeros(len(self.fragrances))
+        for term, weight in zip(self._doc_terms[self._doc_ptr[i]:self._doc_ptr[i + 1]],
+                                self._doc_weights[self._doc_ptr[i]:self._doc_ptr[i + 1]]):
+            start, stop = self._term_ptr[term], self._term_ptr[term + 1]
+            text[self._post_docs[start:stop]] += weight * self._post_weights[start:stop]
+        score += WEIGHTS['notes'] * text
+        return score / sum(WEIGHTS.values())
+
+    def neighbours(self, frag, k=5):
+        """
+        The k fragrances most similar to frag, computed once per fragrance.
+
+        Args:
+            frag (str): Fragrance name.
+            k (int, optional): Number of neighbours, up to 10 (the length kept per fragrance).
+
+        Returns:
+            list: (fragrance, similarity) tuples, most similar first. Empty if frag isn't in the catalog.
+        """
+        if frag not in self._rows:
+            return []
+        cached = self._neighbours.get(frag)
+        if cached is None:
+            score = self.similarity(frag)
+            score[self._rows[frag]] = -np.inf
+            top = min(10, len(score))
+            best = np.argpartition(-score, top - 1)[:top]
+            best = best[np.lexsort((self.fragrances[best], -score[best]))]
+            cached = [(self.fragrances[j], float(score[j])) for j in best if np.isfinite(score[j])]
+            with self._lock:
+                self._neighbours[frag] = cached
+        return cached[:k]
@@ -0,0 +1,233 @@
+"""
+Precompute everything the dashboard shows into a versioned snapshot.
+
+    python snapshot.py                      # writes snapshots/<version>/ and points snapshots/CURRENT at it
+    python snapshot.py --workers 8 --keep 3
+
+A snapshot holds the cleaned catalog, the wears table (wear log included), the run out
+projection, the spend ledger and per fragrance summaries as parquet, plus the plotly json of
+every chart.
+Run the app with CLUBSMELL_SNAPSHOT=1 (or a snapshot directory) to serve it read-only.
+"""
+import argparse
+import concurrent.futures
+import datetime
+import json
+import os
+import shutil
+
+import pandas as pd
+
+import loader
+import validation
+import schema
+import wear_log
+from consumption import SpendLedger
+from figure_cache import FIGURES
+from wears import WearsFunctions, WearsIndex
+
+SNAPSHOT_DIR = os.environ.get('CLUBSMELL_SNAPSHOT_DIR', os.path.join(loader.BASE_DIR, 'snapshots'))
+CHARTS = ['all_wears', 'cumulative_wears', 'bottles']
+
+# set in each worker process by _init_worker, so the wears table is sent once per worker
+_wears_df = None
+
+
+def _init_worker(wears_df):
+    global _wears_df
+    _wears_df = wears_df
+
+
+def render_fragrance(frag, wears_df=None):
+    """
+    Summary numbers and chart json for one tracked fragrance, as the fragrance page computes them.
+
+    Args:
+        frag (str): Fragrance name.
+        wears_df (pd.DataFrame, optional): Wears table. Defaults to the one given to the worker process.
+
+    Returns:
+        dict: 'summary' (dict of numbers) and 'charts' (chart name -> plotly json).
+    """
+    if wears_df is None:
+        wears_df = _wears_df
+    wears, ranking, ml_left, plot_df, ml_start = WearsFunctions.sum_wears(wears_df, frag)
+    bottle_size = plot_df["mL"].values[0]
+    backups = int(plot_df["Backups"].values[0])
+    if backups > 0:
+        pct_list = WearsFunctions.list_mult_bottles(ml_left, ml_start, plot_df)
+    else:
+        pct_list = [ml_left / ml_start]
+    plot, slope = WearsFunctions.cumulative_wears_plot(frag, wears_df)
+
+    summary = {
+        'Fragrance': frag,
+        'Wears': int(wears),
+        'Rank': ranking,
+        'Starting mL': float(ml_start),
+        'Remaining mL': float(ml_left),
+        'Bottle mL': float(bottle_size),
+        'Backups': backups,
+        'Bottle Fills': json.dumps([float(pct) for pct in pct_list]),
+        'Slope': float(slope),
+    }
+    charts = {
+        'all_wears': WearsFunctions.all_wears_plot(frag, wears_df).to_json(),
+        'cumulative_wears': plot.to_json(),
+        'bottles': WearsFunctions.plot_bottle_stack([1] * (backups + 1), pct_list, bottle_size).to_json(),
+    }
+    return {'summary': summary, 'charts': charts}
+
+
+def snapshot_version(index):
+    """Version of the data a snapshot is built from: both workbooks, the wear log and today's date."""
+    sources = [loader.CATALOG_FILE, loader.WEARS_FILE]
+    if os.path.exists(wear_log.WEAR_LOG_FILE):
+        sources.append(wear_log.WEAR_LOG_FILE)
+    # plot_wears stretches the current year by the fraction of it passed, so charts are per day
+    return f"{datetime.date.today():%Y%m%d}-{loader.fingerprint(*sources)}-{index.version}"
+
+
+def build_snapshot(out_dir=SNAPSHOT_DIR, workers=None, keep=3):
+    """
+    Run the whole pipeline and write a snapshot.
+
+    Fragrances are rendered in parallel on a process pool (plotly figure building is CPU bound),
+    or serially with workers=1. The snapshot is written to a temporary directory and renamed
+    into place, then CURRENT is switched to it, so readers never see a half written snapshot.
+
+    Args:
+        out_dir (str, optional): Directory holding the snapshots.
+        workers (int, optional): Worker processes. Defaults to the number of CPUs.
+        keep (int, optional): Snapshots to keep, older ones are deleted.
+
+    Returns:
+        str: Path of the new snapshot.
+    """
+    catalog, wears_df, report = validation.validate(loader.load_catalog(), WearsFunctions.read_wears())
+    index = WearsIndex.of(wears_df)
+    index.sync_log()
+    # from the synced index, like the app: the wear rate needs the logged wears' dates, which
+    # to_frame() folds into the sheet rows
+    projection = WearsFunctions.project_all(wears_df, catalog, index=index)
+    ledger = SpendLedger.of(catalog, wears_df)
+    wears_df = index.to_frame()
+
+    version = snapshot_version(index)
+    path = os.path.join(out_dir, version)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_path, 'charts'))
+
+    fragrances = list(index.totals.index)
+    if workers == 1:
+        rendered = [render_fragrance(frag, wears_df) for frag in fragrances]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(wears_df,)) as pool:
+            rendered = list(pool.map(render_fragrance, fragrances, chunksize=max(len(fragrances) // 64, 1)))
+
+    chart_files = {}
+    for i, result in enumerate(rendered):
+        file_name = f"{i:06d}.json"
+        with open(os.path.join(tmp_path, 'charts', file_name), 'w', encoding='utf-8') as f:
+            json.dump(result['charts'], f)
+        chart_files[result['summary']['Fragrance']] = file_name
+
+    catalog.to_parquet(os.path.join(tmp_path, 'catalog.parquet'))
+    wears_df.to_parquet(os.path.join(tmp_path, 'wears.parquet'))
+    projection.to_parquet(os.path.join(tmp_path, 'projection.parquet'))
+    ledger.frame.to_parquet(os.path.join(tmp_path, 'ledger.parquet'))
+    pd.DataFrame([result['summary'] for result in rendered]).to_parquet(os.path.join(tmp_path, 'summaries.parquet'))
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': version,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'charts': chart_files,
+            'validation': report.frame().to_dict('records'),
+        }, f, indent=1)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    current_tmp = os.path.join(out_dir, 'CURRENT.tmp')
+    with open(current_tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(out_dir, 'CURRENT'))
+
+    old = sorted(
+        (entry for entry in os.listdir(out_dir) if os.path.isdir(os.path.join(out_dir, entry)) and entry != version),
+        key=lambda entry: os.path.getmtime(os.path.join(out_dir, entry)),
+    )
+    for entry in old[:max(len(old) - keep + 1, 0)]:
+        shutil.rmtree(os.path.join(out_dir, entry), ignore_errors=True)
+    return path
+
+
+class Snapshot:
+    """
+    A snapshot written by build_snapshot, loaded read-only.
+
+    Attributes:
+        version (str): Snapshot version.
+        catalog (pd.DataFrame): The cleaned catalog.
+        wears (pd.DataFrame): The wears table, wear log included.
+        projection (pd.DataFrame): project_all() output.
+        ledger (SpendLedger): The spend ledger, with the atomizer profiles of when it was built.
+        summaries (pd.DataFrame): One row per tracked fragrance, indexed by Fragrance.
+        loaded (datetime.datetime): When it was loaded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.version = manifest['version']
+        self._chart_files = manifest['charts']
+        # shared by every session like the cached frames, so read-only too
+        self.catalog = schema.freeze(loader.read_parquet(os.path.join(path, 'catalog.parquet')))
+        self.wears = schema.freeze(loader.read_parquet(os.path.join(path, 'wears.parquet')))
+        self.projection = pd.read_parquet(os.path.join(path, 'projection.parquet'))
+        ledger_path = os.path.join(path, 'ledger.parquet')
+        if os.path.exists(ledger_path):
+            self.ledger = SpendLedger(schema.freeze(pd.read_parquet(ledger_path)))
+        else:
+            # snapshots from before the ledger was added
+            self.ledger = SpendLedger.of(self.catalog, self.wears, version=self.version)
+        self.summaries = pd.read_parquet(os.path.join(path, 'summaries.parquet')).set_index('Fragrance')
+        self.loaded = datetime.datetime.now()
+
+    @staticmethod
+    def load(out_dir=SNAPSHOT_DIR):
+        """The snapshot CURRENT points at, loaded once per version and shared between reruns."""
+        with open(os.path.join(out_dir, 'CURRENT'), encoding='utf-8') as f:
+            version = f.read().strip()
+        return loader.memoize('snapshot', version, lambda: Snapshot(os.path.join(out_dir, version)))
+
+    def chart(self, frag, name):
+        """The precomputed chart (one of CHARTS) for a fragrance, or None if it isn't tracked."""
+        if frag not in self._chart_files:
+            return None
+        return FIGURES.get(('snapshot', self.version, frag, name), lambda: self._load_chart(frag, name))
+
+    def _load_chart(self, frag, name):
+        # imported here like in wears.py, plotly is only needed once a chart is shown
+        import plotly.io as pio
+        return pio.from_json(self._chart_json(frag)[name])
+
+    def _chart_json(self, frag):
+        with open(os.path.join(self.path, 'charts', self._chart_files[frag]), encoding='utf-8') as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default=SNAPSHOT_DIR, help='directory holding the snapshots')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, 1 to run serially')
+    parser.add_argument('--keep', type=int, default=3, help='number of snapshots to keep')
+    args = parser.parse_args()
+
+    path = build_snapshot(args.out, args.workers, args.keep)
+    print(f"snapshot written to {path}")
+
+
+if __name__ == '__main__':
+    main()
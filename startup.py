@@ -0,0 +1,117 @@
+"""
+Import cost of starting the dashboard, from `python -X importtime`.
+
+A new server worker imports streamlit and the modules app.py imports at the top before it can
+render anything, so that is what gets timed: the imports at the top of app.py, up to its first
+statement that does something else (st.set_page_config), read from its source so the list
+follows the app, imported in a fresh interpreter. Modules imported later are not part of it:
+the table and index modules (wears, facets, search, similar, consumption) are imported by
+core.data() with the data and timed in the profiler's "data" stage, plotly when a chart is built
+and openpyxl when a workbook is parsed.
+
+    python startup.py                       # median of 5 cold imports, and the slowest modules
+    python startup.py --repeat 10 --top 30 --json startup.json
+    python startup.py --budget-ms 1500      # exit 1 if the median is over budget, for CI
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import loader
+
+APP_FILE = os.path.join(loader.BASE_DIR, 'app.py')
+
+
+def app_imports(path=APP_FILE):
+    """
+    Modules imported at the top of a script, in order: the imports before its first statement
+    that isn't an import or an assignment. Later imports and imports inside functions or blocks aren't.
+    """
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            continue
+        else:
+            break
+        modules += [name for name in names if name not in modules]
+    return modules
+
+
+def import_times(modules):
+    """
+    Import modules in a fresh interpreter with -X importtime.
+
+    Returns:
+        tuple: A tuple containing the following elements:
+            - dict: Module -> (self us, cumulative us), for every module the import loaded.
+            - int: Total microseconds, the cumulative times of the top level imports added up.
+    """
+    code = '; '.join(f'import {module}' for module in modules)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=loader.BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package, indented two spaces per nesting level
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+        if not name[1:].startswith(' '):
+            total_us += int(cumulative_us)
+    return times, total_us
+
+
+def measure(modules, repeat):
+    """Median total import time of modules in ms over repeat runs, and the last run's times."""
+    totals = []
+    for _ in range(repeat):
+        times, total_us = import_times(modules)
+        totals.append(total_us)
+    return statistics.median(totals) / 1000, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='cold imports to take the median of')
+    parser.add_argument('--top', type=int, default=15, help='slowest modules to list')
+    parser.add_argument('--budget-ms', type=float, default=None, help='fail if the median is over this')
+    parser.add_argument('--json', default=None, help='also write the results to this file')
+    args = parser.parse_args()
+
+    modules = app_imports()
+    total_ms, times = measure(modules, args.repeat)
+    print(f"app.py imports ({len(modules)} modules): {total_ms:.0f} ms, median of {args.repeat}")
+    print(f"  {', '.join(modules)}")
+    print()
+    print(f"{'module':<50} {'self ms':>9} {'cumulative ms':>14}")
+    slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{name:<50} {self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'modules': modules,
+                'total_ms': total_ms,
+                'slowest': [{'module': name, 'self_ms': s / 1000, 'cumulative_ms': c / 1000} for name, (s, c) in slowest],
+            }, f, indent=1)
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"over budget: {total_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
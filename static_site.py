@@ -0,0 +1,285 @@
+"""
+Render every fragrance page of the dashboard to static HTML.
+
+    python static_site.py                   # writes site/index.html and site/fragrances/*.html
+    python static_site.py --out public --workers 4 --full
+
+Pages carry their plotly charts as embedded json (plotly.js comes from its CDN), so the site
+can be served from any static host. Only pages whose inputs changed since the last run are
+rendered again, unless --full is given.
+"""
+import argparse
+import concurrent.futures
+import datetime
+import hashlib
+import html
+import json
+import os
+import re
+
+import numpy as np
+import plotly.io as pio
+
+import loader
+import validation
+from consumption import SpendLedger
+from facets import FacetIndex
+from similar import SimilarityIndex
+from wears import WearsFunctions, WearsIndex
+
+SITE_DIR = os.path.join(loader.BASE_DIR, 'site')
+MANIFEST_FILE = '.pages.json'
+PLOTLY_JS = '<script src="https://cdn.plot.ly/plotly-2.12.1.min.js" charset="utf-8"></script>'
+
+STYLE = """
+body { background: #fcf6fe; color: #000000; font-family: sans-serif; max-width: 1100px; margin: 2em auto; padding: 0 1em; }
+a { color: #602ec9; }
+.row { display: flex; gap: 2em; }
+.row > div { flex: 1; }
+.small { font-size: small; }
+"""
+
+# set in each worker process by _init_worker
+_site_data = None
+
+
+def _init_worker(site_data):
+    global _site_data
+    _site_data = site_data
+
+
+def page_file(frag):
+    """File name of a fragrance's page: a readable slug plus a short hash, so names never collide."""
+    slug = re.sub(r'[^a-z0-9]+', '-', str(frag).lower()).strip('-')[:60]
+    return f"{slug}-{hashlib.sha1(str(frag).encode()).hexdigest()[:8]}.html"
+
+
+def page_hash(frag, facets, index, order_hash, today, similar, ledger, projection):
+    """
+    Hash of everything a fragrance's page shows: its catalog rows, its wear rows, the all wears
+    ranking, its similar fragrances, its ledger row (where the atomizer profile comes in), its
+    run out projection row and, for tracked fragrances, the date the cumulative wears chart is
+    drawn for (its current year's width grows daily). projection is indexed by Fragrance.
+    """
+    h = hashlib.sha1(f"{frag}|{today.year}".encode())
+    h.update(facets.selection(frag).to_json().encode())
+    h.update(json.dumps(similar.neighbours(frag)).encode())
+    h.update(json.dumps(ledger.row(frag), default=str).encode())
+    if frag in index:
+        h.update(today.isoformat().encode())
+        h.update(index.rows(frag).to_json().encode())
+        h.update(order_hash.encode())
+        if frag in projection.index:
+            h.update(projection.loc[[frag]].to_json().encode())
+    return h.hexdigest()
+
+
+def _first(df_selection, column):
+    values = df_selection[column].dropna()
+    return values.iloc[0] if len(values) else None
+
+
+def _section(title, value, note=None):
+    note_html = f'<div class="small">{html.escape(note)}</div>' if note else ''
+    return f'<div><h3>{html.escape(title)}</h3><h3>{html.escape(str(value))}</h3>{note_html}</div>'
+
+
+def render_page(frag, site_data=None):
+    """
+    The HTML page for one fragrance, with the same content as its page in app.py.
+
+    Args:
+        frag (str): Fragrance name.
+        site_data (dict, optional): 'catalog', 'wears', 'projection', 'ledger' and 'today'. Defaults to the worker's.
+
+    Returns:
+        str: The page.
+    """
+    if site_data is None:
+        site_data = _site_data
+    wears_df = site_data['wears']
+    df_selection = FacetIndex.of(site_data['catalog']).selection(frag)
+    index = WearsIndex.of(wears_df)
+
+    score = _first(df_selection, "Score out of 100")
+    perfo = _first(df_selection, "Performance (1-10)")
+    scent = _first(df_selection, "Scent (1-10)*")
+    cost_per_wear = site_data['ledger'].values("Cost per Wear", [frag])[0]
+
+    parts = [
+        '<p><a href="../index.html">All fragrances</a></p>',
+        f'<h1>{html.escape(str(frag))}</h1>',
+        '<div class="row">'
+        + _section("House", _first(df_selection, "House"))
+        + _section("Perfumer", _first(df_selection, "Perfumer"))
+        + _section("Type", _first(df_selection, "Type"))
+        + '</div>',
+    ]
+    for note in df_selection["My notes"].dropna():
+        parts.append(f'<p>{html.escape(str(note))}</p>')
+    parts.append(
+        '<div class="row">'
+        + _section("Scent", "NA" if scent is None else round(float(scent), 4),
+                   "(1-10) A 10 smells of beauty, perfection. Some fragrances will be alotted an extra 0.25.")
+        + _section("Performance", "NA" if perfo is None else int(perfo),
+                   "(1-10) A 10 has all day/all night longevity and a noticeable sillage.")
+        + _section("Score", "NA" if score is None else int(score), "(1-100) Final score.")
+        + '</div>'
+    )
+    neighbours = SimilarityIndex.of(site_data['catalog']).neighbours(frag)
+    if neighbours:
+        items = ''.join(
+            f'<li><a href="{page_file(other)}">{html.escape(str(other))}</a> ({similarity:.0%} alike)</li>'
+            for other, similarity in neighbours
+        )
+        parts.append(f'<h3>Fragrances like this one</h3><ol>{items}</ol>')
+    parts.append('<hr>')
+
+    cost = "" if np.isnan(cost_per_wear) else _section("💸💸💸", "${:.2f} per Wear".format(cost_per_wear))
+    if frag in index:
+        wears, ranking, ml_left, plot_df, ml_start = WearsFunctions.sum_wears(wears_df, frag)
+        backups = int(plot_df["Backups"].values[0])
+        pct_list = WearsFunctions.list_mult_bottles(ml_left, ml_start, plot_df) if backups > 0 else [ml_left / ml_start]
+        plot, slope = WearsFunctions.cumulative_wears_plot(frag, wears_df, site_data['today'])
+        projection = site_data['projection']
+        year_empty = projection.loc[projection["Fragrance"] == frag, "Year to Run out"].iloc[0]
+        figures = [
+            WearsFunctions.all_wears_plot(frag, wears_df),
+            plot,
+            WearsFunctions.plot_bottle_stack([1] * (backups + 1), pct_list, plot_df["mL"].values[0]),
+        ]
+        parts.append('<h3>Wears Tracker</h3>')
+        parts += [pio.to_html(fig, full_html=False, include_plotlyjs=False) for fig in figures[:2]]
+        parts.append(
+            '<div class="row">'
+            + _section("Starting mL", ml_start)
+            + _section("Remaining mL", round(ml_left))
+            + _section("Year to Run out", year_empty)
+            + '</div>'
+            + cost
+        )
+        parts.append(pio.to_html(figures[2], full_html=False, include_plotlyjs=False))
+    else:
+        parts.append('<h3>Wears not tracked yet.</h3>' + cost)
+
+    return _document(str(frag), parts)
+
+
+def render_index(facets):
+    """The landing page: every scored fragrance best to worst, then the unscored ones."""
+    scored = facets.best_to_worst
+    unscored = [frag for frag in facets.df["Fragrance"].unique() if frag not in set(scored)]
+    items = ''.join(
+        f'<li><a href="fragrances/{page_file(frag)}">{html.escape(str(frag))}</a></li>' for frag in scored + unscored
+    )
+    return _document("Insane Fragrance Dashboard", [
+        '<h1>Insane Fragrance Dashboard</h1>',
+        '<p>Fragrances, ordered best to worst:</p>',
+        f'<ol>{items}</ol>',
+    ])
+
+
+def _document(title, parts):
+    generated = datetime.date.today().strftime('%d %B %Y')
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+        f'<title>{html.escape(title)}</title>{PLOTLY_JS}<style>{STYLE}</style></head><body>'
+        + '\n'.join(parts)
+        + '<hr><div class="small">Data from Anonymous Man, to whom I am grateful :)<br> By CLUBSMELL. '
+        f'Generated {generated}.</div>'
+        '<p><a href="http://www.clubsmell.com">CLUBSMELL.COM</a></p>'
+        '</body></html>\n'
+    )
+
+
+def build_site(out_dir=SITE_DIR, workers=None, full=False):
+    """
+    Render the site, regenerating only the pages whose inputs changed.
+
+    Each page's inputs are hashed (catalog rows, wear rows, the all wears ranking, similar fragrances,
+    ledger and projection rows shown on it, the date the charts are drawn for) and compared to the hashes stored in the output directory by the previous run. Changed
+    pages are rendered on a process pool; pages of fragrances no longer in the catalog are removed.
+
+    Args:
+        out_dir (str, optional): Output directory.
+        workers (int, optional): Worker processes, 1 to render serially. Defaults to the number of CPUs.
+        full (bool, optional): Render every page even if unchanged.
+
+    Returns:
+        list: Fragrances whose pages were rendered.
+    """
+    catalog, wears_df, _ = validation.validate(loader.load_catalog(), WearsFunctions.read_wears())
+    index = WearsIndex.of(wears_df)
+    index.sync_log()
+    today = datetime.date.today()
+    # from the synced index, like the app: the wear rate needs the logged wears' dates, which
+    # to_frame() folds into the sheet rows
+    projection = WearsFunctions.project_all(wears_df, catalog, today, index=index)
+    wears_df = index.to_frame()
+    index = WearsIndex.of(wears_df)
+    site_data = {
+        'catalog': catalog,
+        'wears': wears_df,
+        'projection': projection,
+        'ledger': SpendLedger.of(catalog, wears_df),
+        'today': today,
+    }
+    facets = FacetIndex.of(catalog)
+
+    pages_dir = os.path.join(out_dir, 'fragrances')
+    os.makedirs(pages_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    previous = {}
+    if os.path.exists(manifest_path) and not full:
+        with open(manifest_path, encoding='utf-8') as f:
+            previous = json.load(f)
+
+    order_hash = hashlib.sha1(index.order.to_json().encode()).hexdigest()
+    similar = SimilarityIndex.of(catalog)
+    projection = site_data['projection'].set_index("Fragrance")
+    hashes = {
+        str(frag): page_hash(frag, facets, index, order_hash, today, similar, site_data['ledger'], projection)
+        for frag in catalog["Fragrance"].unique()
+    }
+    names = {str(frag): frag for frag in catalog["Fragrance"].unique()}
+    changed = [
+        names[key] for key, digest in hashes.items()
+        if previous.get(key) != digest or not os.path.exists(os.path.join(pages_dir, page_file(names[key])))
+    ]
+
+    if workers == 1 or len(changed) < 2:
+        pages = [render_page(frag, site_data) for frag in changed]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(site_data,)) as pool:
+            pages = list(pool.map(render_page, changed, chunksize=max(len(changed) // 64, 1)))
+
+    for frag, page in zip(changed, pages):
+        with open(os.path.join(pages_dir, page_file(frag)), 'w', encoding='utf-8') as f:
+            f.write(page)
+
+    for key in set(previous) - set(hashes):
+        try:
+            os.remove(os.path.join(pages_dir, page_file(key)))
+        except OSError:
+            pass
+
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(render_index(facets))
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(hashes, f, indent=1)
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default=SITE_DIR, help='output directory')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, 1 to render serially')
+    parser.add_argument('--full', action='store_true', help='render every page, not only the changed ones')
+    args = parser.parse_args()
+
+    changed = build_site(args.out, args.workers, args.full)
+    print(f"rendered {len(changed)} pages into {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+WearsFunctions.bottle_fills() and list_mult_bottles() against the per-bottle loop they replaced.
+
+    python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from wears import WearsFunctions
+
+
+def loop_fills(mL_left, mL_start, bottle_ml, num_bottles):
+    """list_mult_bottles() as it was before bottle_fills(), kept as the reference."""
+    mL_used = mL_start - mL_left
+    first_bottle_pct = mL_used / bottle_ml
+
+    pct_list = []
+
+    if first_bottle_pct < 1:
+        pct_list = [1] * (num_bottles - 1)
+        first_bottle_pct_filled = 1 - first_bottle_pct
+        if mL_left > mL_start:
+            first_bottle_pct_filled = 1
+        pct_list.insert(0, first_bottle_pct_filled)
+        return pct_list
+    else:
+        for i in range(0, num_bottles):
+            if first_bottle_pct > 1:
+                pct_list.append(0)
+                next_ml_used = mL_used - bottle_ml
+                first_bottle_pct = next_ml_used / bottle_ml
+                mL_used = next_ml_used
+            elif first_bottle_pct < 1:
+                pct_list.append(1 - first_bottle_pct)
+                first_bottle_pct = 1
+            else:
+                pct_list.append(1)
+                first_bottle_pct = 1
+        return pct_list
+
+
+def plot_df(bottle_ml, num_bottles):
+    return pd.DataFrame({"mL": [bottle_ml], "Backups": [num_bottles - 1]})
+
+
+def random_cases(n, seed):
+    """Bottles of 1-250 mL, 1-6 of them, anywhere from unused (and over-full) to used up twice over."""
+    rng = np.random.default_rng(seed)
+    bottle_ml = rng.uniform(1, 250, n)
+    num_bottles = rng.integers(1, 7, n)
+    mL_start = bottle_ml * num_bottles
+    mL_used = mL_start * rng.uniform(-0.5, 2, n)
+    return mL_start - mL_used, mL_start, bottle_ml, num_bottles
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_bottle_fills_matches_loop(seed):
+    mL_left, mL_start, bottle_ml, num_bottles = random_cases(2000, seed)
+    fills = WearsFunctions.bottle_fills(mL_left, mL_start, bottle_ml, num_bottles)
+
+    assert fills.shape == (len(mL_left), num_bottles.max())
+    for i in range(len(mL_left)):
+        expected = loop_fills(mL_left[i], mL_start[i], bottle_ml[i], num_bottles[i])
+        np.testing.assert_allclose(fills[i, :num_bottles[i]], expected, rtol=0, atol=1e-9)
+        assert np.isnan(fills[i, num_bottles[i]:]).all()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_list_mult_bottles_matches_loop(seed):
+    for mL_left, mL_start, bottle_ml, num_bottles in zip(*random_cases(200, seed)):
+        fills = WearsFunctions.list_mult_bottles(mL_left, mL_start, plot_df(bottle_ml, num_bottles))
+        expected = loop_fills(mL_left, mL_start, bottle_ml, num_bottles)
+        assert len(fills) == num_bottles
+        np.testing.assert_allclose(fills, expected, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("mL_left, expected", [
+    (300, [1, 1, 1]),      # unused
+    (250, [0.5, 1, 1]),    # half of the first bottle
+    (150, [0, 0.5, 1]),    # first bottle empty, second half full
+    (0, [0, 0, 0]),        # all used up
+])
+def test_list_mult_bottles_examples(mL_left, expected):
+    assert WearsFunctions.list_mult_bottles(mL_left, 300, plot_df(100, 3)) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("mL_left, expected, loop", [
+    # exactly one bottle used: the loop kept it full, it is empty
+    (200, [0, 1, 1], [1, 1, 1]),
+    # exactly two bottles used: the loop filled the second bottle back up
+    (100, [0, 0, 1], [0, 1, 1]),
+])
+def test_exact_bottle_boundary(mL_left, expected, loop):
+    assert WearsFunctions.list_mult_bottles(mL_left, 300, plot_df(100, 3)) == pytest.approx(expected)
+    assert loop_fills(mL_left, 300, 100, 3) == pytest.approx(loop)
+
+
+def test_over_use_empties_every_bottle():
+    # the atomizer profiles can underestimate, so mL left goes negative
+    assert WearsFunctions.list_mult_bottles(-50, 300, plot_df(100, 3)) == pytest.approx([0, 0, 0])
+    assert loop_fills(-50, 300, 100, 3) == pytest.approx([0, 0, 0])
+
+
+def test_more_left_than_at_the_start_keeps_bottles_full():
+    assert WearsFunctions.list_mult_bottles(350, 300, plot_df(100, 3)) == pytest.approx([1, 1, 1])
+    assert WearsFunctions.list_mult_bottles(120, 100, plot_df(100, 1)) == pytest.approx([1])
+    assert loop_fills(350, 300, 100, 3) == pytest.approx([1, 1, 1])
+
+
+def test_bottle_fills_pads_with_nan():
+    fills = WearsFunctions.bottle_fills([150, 50, 80], [300, 100, 160], [100, 100, 80], [3, 1, 2])
+    np.testing.assert_allclose(fills, [[0, 0.5, 1], [0.5, np.nan, np.nan], [0, 1, np.nan]])
+
+
+def test_bottle_fills_empty():
+    assert WearsFunctions.bottle_fills([], [], [], []).shape == (0, 0)
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from search import SearchIndex
+
+
+def catalog():
+    return pd.DataFrame({
+        'Fragrance': ['Cuir Beluga', 'Caleche Parfum', 'Mitsouko', 'Aqua Allegoria'],
+        'House': ['Guerlain', 'Hermes', 'Guerlain', 'Guerlain'],
+        'Perfumer': ['Olivier Polge', 'Guy Robert', 'Jacques Guerlain', 'Thierry Wasser'],
+        'Type': ['Leather', 'Floral Aldehyde', 'Chypre', 'Citrus'],
+        'My notes': ['suede and amber', 'soapy aldehydes', 'peach and oakmoss', 'quite fresh'],
+    })
+
+
+def test_one_character_matches_name_prefixes_only():
+    index = SearchIndex(catalog())
+    assert index.search('c') == [('Caleche Parfum', 1.0), ('Cuir Beluga', 1.0)]
+    # 'q' is in the notes of Aqua Allegoria, but one character has no trigram to score by
+    assert index.search('q') == []
+
+
+def test_unmatched_query_returns_nothing():
+    assert SearchIndex(catalog()).search('zz') == []
+
+
+def test_fuzzy_and_prefix_matches():
+    index = SearchIndex(catalog())
+    assert index.search('cuir')[0][0] == 'Cuir Beluga'
+    assert index.search('mitsuko')[0][0] == 'Mitsouko'
+    assert 'Cuir Beluga' in [frag for frag, _ in index.search('guerlain')]
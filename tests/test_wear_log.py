@@ -0,0 +1,174 @@
+"""
+Reading the wear log incrementally (wear_log.read_wear_log) and replaying it on a WearsIndex.
+
+    python -m pytest tests
+"""
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+import wear_log
+from wears import WearsIndex
+
+DAY = datetime.date(2024, 2, 4)
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    return str(tmp_path / 'wear_log.csv')
+
+
+def write(log_file, text, mode='a'):
+    with open(log_file, mode, newline='', encoding='utf-8') as f:
+        f.write(text)
+
+
+def wears_df():
+    return pd.DataFrame({
+        'Fragrance': ['Cuir Beluga', 'Mitsouko', 'Cuir Beluga'],
+        'House': ['Guerlain', 'Guerlain', 'Guerlain'],
+        'mL': [75, 50, 75],
+        'Wears': [5, 3, 2],
+        'Backups': [0, 1, 0],
+        'sheet_name': ['Wears for 2022', 'Wears for 2022', 'Wears for 2023'],
+    })
+
+
+def test_missing_log(log_file):
+    assert wear_log.read_wear_log(log_file) == ([], wear_log.START, [], False)
+
+
+def test_reads_only_what_was_appended(log_file):
+    wear_log.append_wear('Cuir Beluga', 1, DAY, log_file)
+    entries, position, skipped, replaced = wear_log.read_wear_log(log_file)
+    assert entries == [(DAY, 'Cuir Beluga', 1)]
+    assert position.offset == os.path.getsize(log_file)
+    assert not skipped and not replaced
+
+    # nothing new: same position, nothing read again
+    assert wear_log.read_wear_log(log_file, position) == ([], position, [], False)
+
+    wear_log.append_wear('Mitsouko', 2, DAY, log_file)
+    entries, position, skipped, replaced = wear_log.read_wear_log(log_file, position)
+    assert entries == [(DAY, 'Mitsouko', 2)]
+    assert position.offset == os.path.getsize(log_file)
+    assert not replaced
+
+
+def test_partial_line_is_left_for_later(log_file):
+    wear_log.append_wear('Cuir Beluga', 1, DAY, log_file)
+    write(log_file, '2024-02-05,Mitsouko')
+    entries, position, _, _ = wear_log.read_wear_log(log_file)
+    assert entries == [(DAY, 'Cuir Beluga', 1)]
+    assert position.offset < os.path.getsize(log_file)
+
+    write(log_file, ',3\n')
+    entries, position, _, replaced = wear_log.read_wear_log(log_file, position)
+    assert entries == [(datetime.date(2024, 2, 5), 'Mitsouko', 3)]
+    assert position.offset == os.path.getsize(log_file)
+    assert not replaced
+
+
+def test_malformed_lines_are_skipped_and_passed(log_file):
+    wear_log.append_wear('Cuir Beluga', 1, DAY, log_file)
+    write(log_file, 'garbage\n2024-13-01,Mitsouko,1\n2024-02-05,Mitsouko,x\n')
+    wear_log.append_wear('Mitsouko', 2, DAY, log_file)
+    entries, position, skipped, _ = wear_log.read_wear_log(log_file)
+    assert entries == [(DAY, 'Cuir Beluga', 1), (DAY, 'Mitsouko', 2)]
+    assert skipped == [['garbage'], ['2024-13-01', 'Mitsouko', '1'], ['2024-02-05', 'Mitsouko', 'x']]
+    assert position.offset == os.path.getsize(log_file)
+
+
+def test_truncated_log_is_read_from_the_start(log_file):
+    for _ in range(3):
+        wear_log.append_wear('Cuir Beluga', 1, DAY, log_file)
+    _, position, _, _ = wear_log.read_wear_log(log_file)
+
+    write(log_file, '', mode='w')
+    entries, position, _, replaced = wear_log.read_wear_log(log_file, position)
+    assert entries == [] and replaced
+    assert position.offset == 0
+
+    wear_log.append_wear('Mitsouko', 1, DAY, log_file)
+    entries, _, _, replaced = wear_log.read_wear_log(log_file, position)
+    assert entries == [(DAY, 'Mitsouko', 1)] and not replaced
+
+
+def test_cleared_and_refilled_past_the_old_position(log_file):
+    for _ in range(3):
+        wear_log.append_wear('Cuir Beluga', 1, DAY, log_file)
+    _, position, _, _ = wear_log.read_wear_log(log_file)
+
+    # cleared by hand, then 4 wears logged before the next read
+    write(log_file, '', mode='w')
+    for day in range(1, 5):
+        wear_log.append_wear('Mitsouko', 1, datetime.date(2024, 3, day), log_file)
+    assert os.path.getsize(log_file) > position.offset
+
+    entries, _, skipped, replaced = wear_log.read_wear_log(log_file, position)
+    assert replaced and not skipped
+    assert entries == [(datetime.date(2024, 3, day), 'Mitsouko', 1) for day in range(1, 5)]
+
+
+def test_replaced_file_is_read_from_the_start(log_file, tmp_path):
+    wear_log.append_wear('Cuir Beluga', 1, DAY, log_file)
+    _, position, _, _ = wear_log.read_wear_log(log_file)
+
+    new_file = str(tmp_path / 'new.csv')
+    wear_log.append_wear('Cuir Beluga', 1, DAY, new_file)
+    wear_log.append_wear('Mitsouko', 1, DAY, new_file)
+    os.replace(new_file, log_file)
+    entries, _, _, replaced = wear_log.read_wear_log(log_file, position)
+    assert replaced
+    assert entries == [(DAY, 'Cuir Beluga', 1), (DAY, 'Mitsouko', 1)]
+
+
+def test_deleted_log(log_file):
+    wear_log.append_wear('Cuir Beluga', 1, DAY, log_file)
+    _, position, _, _ = wear_log.read_wear_log(log_file)
+    os.remove(log_file)
+    assert wear_log.read_wear_log(log_file, position) == ([], wear_log.START, [], True)
+
+
+def test_index_sync_log(log_file):
+    index = WearsIndex(wears_df())
+    wear_log.append_wear('Cuir Beluga', 2, DAY, log_file)
+    wear_log.append_wear('Not Tracked', 1, DAY, log_file)
+    assert index.sync_log(log_file) == 1
+    assert index.totals['Cuir Beluga'] == 9
+    assert index.log_unknown == ['Not Tracked']
+    assert index.sync_log(log_file) == 0
+    assert index.totals['Cuir Beluga'] == 9
+
+
+def test_index_forgets_a_cleared_log(log_file):
+    index = WearsIndex(wears_df())
+    for _ in range(3):
+        wear_log.append_wear('Cuir Beluga', 1, DAY, log_file)
+    index.sync_log(log_file)
+    assert index.totals['Cuir Beluga'] == 10
+    assert 'Wears for 2024' in index.sheets
+
+    # the wears were copied into the workbook and the log cleared: they no longer count here
+    write(log_file, '', mode='w')
+    version = index.version
+    assert index.sync_log(log_file) == 0
+    assert index.totals['Cuir Beluga'] == 7
+    assert index.log_entries == []
+    assert 'Wears for 2024' not in index.sheets
+    assert index.rows('Cuir Beluga')['Wears'].tolist() == [5, 2]
+    assert index.version > version
+
+    # cleared and refilled past the old position between syncs: only the new wears count
+    for _ in range(3):
+        wear_log.append_wear('Cuir Beluga', 1, DAY, log_file)
+    index.sync_log(log_file)
+    write(log_file, '', mode='w')
+    for _ in range(4):
+        wear_log.append_wear('Mitsouko', 1, DAY, log_file)
+    assert index.sync_log(log_file) == 4
+    assert index.totals['Cuir Beluga'] == 7
+    assert index.totals['Mitsouko'] == 7
+    assert len(index.log_entries) == 4
@@ -0,0 +1,263 @@
+"""
+The checks and cleaning the catalog and wears tables get once, when they are loaded.
+
+validate() runs every rule over whole columns at once and returns clean, frozen tables with a
+report of what it found and fixed. Code that uses the tables can then count on:
+  - every column of schema.CATALOG and schema.WEARS being there, numeric columns numeric;
+  - one catalog row per fragrance, each with a House and a Fragrance;
+  - wears rows with a fragrance, wears > 0, a bottle size > 0 and Backups >= 0;
+  - one mL and Backups per fragrance across the "Wears for" sheets (the latest sheet's);
+  - wears fragrance names spelled as in the catalog, where the catalog has them.
+
+    python validation.py                    # report for the workbooks, exits 1 if there are errors
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+import schema
+
+# columns the tables can't be used without. Other schema columns are added empty if missing,
+# except the ones validate() derives.
+REQUIRED = {'catalog': ['House', 'Fragrance'], 'wears': ['Fragrance', 'mL', 'Wears', 'Backups', 'sheet_name']}
+NUMERIC = {
+    'catalog': ['$', 'mL', 'Score out of 100', 'Performance (1-10)', 'Scent (1-10)*'],
+    'wears': ['mL', 'Wears', 'Backups'],
+}
+DERIVED = ['Retail $/mL', 'First_Word_Type']
+
+# Row rules, applied in order: (check, level, rows, fix). rows(df) is a boolean mask of the rows
+# that fail, fix is 'drop' or {column: value} to set on them (None for missing).
+# Levels: 'error' needs fixing in the workbook, 'warning' was fixed here but the workbook should
+# be fixed too, 'info' is expected (e.g. empty rows).
+CATALOG_RULES = [
+    ('empty row', 'info', lambda df: df.isna().all(axis=1), 'drop'),
+    ('missing House or Fragrance', 'warning', lambda df: df['House'].isna() | df['Fragrance'].isna(), 'drop'),
+    ('duplicate Fragrance, first row kept', 'warning', lambda df: df['Fragrance'].duplicated(), 'drop'),
+    ('negative $', 'warning', lambda df: df['$'] < 0, {'$': None}),
+    ('mL not positive', 'warning', lambda df: df['mL'] <= 0, {'mL': None}),
+    ('negative Score', 'warning', lambda df: df['Score out of 100'] < 0, {'Score out of 100': None}),
+    ('negative Performance', 'warning', lambda df: df['Performance (1-10)'] < 0, {'Performance (1-10)': None}),
+    ('negative Scent', 'warning', lambda df: df['Scent (1-10)*'] < 0, {'Scent (1-10)*': None}),
+]
+WEARS_RULES = [
+    ('missing Fragrance', 'warning', lambda df: df['Fragrance'].isna(), 'drop'),
+    ('no wears', 'info', lambda df: df['Wears'] == 0, 'drop'),
+    ('Wears missing or negative', 'warning', lambda df: ~(df['Wears'] > 0), 'drop'),
+    ('mL missing or not positive', 'warning', lambda df: ~(df['mL'] > 0), 'drop'),
+    ('Backups missing or negative', 'warning', lambda df: ~(df['Backups'] >= 0), {'Backups': 0}),
+]
+
+# examples of fragrances listed per report line
+EXAMPLES = 5
+
+
+class ValidationError(ValueError):
+    """A table is missing a column it can't be used without."""
+
+
+class ValidationReport:
+    """
+    What validate() found, one line per check that failed on some rows.
+
+    Attributes:
+        issues (list): (table, check, level, rows, action, examples) tuples, in the order found.
+    """
+
+    COLUMNS = ['Table', 'Check', 'Level', 'Rows', 'Action', 'Examples']
+
+    def __init__(self):
+        self.issues = []
+
+    def add(self, table, check, level, rows, action, examples=()):
+        self.issues.append((table, check, level, int(rows), action, ', '.join(str(e) for e in list(examples)[:EXAMPLES])))
+
+    def __len__(self):
+        return len(self.issues)
+
+    @property
+    def errors(self):
+        """Issues that need fixing in the workbooks."""
+        return [issue for issue in self.issues if issue[2] == 'error']
+
+    def frame(self):
+        return pd.DataFrame(self.issues, columns=ValidationReport.COLUMNS)
+
+    def summary(self):
+        """The report as text, one line per issue."""
+        if not self.issues:
+            return 'no issues'
+        return '\n'.join(
+            f"{level:<7} {table:<7} {check}: {rows} rows, {action}" + (f" ({examples})" if examples else '')
+            for table, check, level, rows, action, examples in self.issues
+        )
+
+
+def _fragrances(df, mask):
+    return pd.unique(df.loc[mask, 'Fragrance'].dropna().astype(str))
+
+
+def _name_key(names):
+    """Names as compared across the workbooks: case and spacing ignored."""
+    return names.astype(str).str.casefold().str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def _check_columns(df, table, columns, report):
+    missing = [col for col in REQUIRED[table] if col not in df.columns]
+    if missing:
+        raise ValidationError(f"{table} is missing columns {missing}")
+    for col in columns:
+        if col not in df.columns and col not in DERIVED:
+            df[col] = np.nan
+            report.add(table, f'missing column {col}', 'warning', len(df), 'added empty')
+    for col in NUMERIC[table]:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        numbers = pd.to_numeric(df[col].astype(object), errors='coerce')
+        lost = numbers.isna() & df[col].notna()
+        if lost.any():
+            report.add(table, f'{col} not a number', 'warning', lost.sum(), 'set to missing', _fragrances(df, lost))
+        df[col] = numbers
+
+
+def _strip_names(df, table, report):
+    # each distinct name is cleaned once, wears repeat every name once per sheet
+    column = df['Fragrance']
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes, names = column.cat.codes.to_numpy(), column.cat.categories
+    else:
+        codes, names = pd.factorize(column.astype(object))
+    names = [str(name) for name in names]
+    # a last entry for the missing names, code -1
+    stripped = np.array([' '.join(name.split()) or None for name in names] + [None], dtype=object)
+    changed = np.append(stripped[:-1] != np.array(names, dtype=object), False)[codes]
+    if changed.any():
+        report.add(table, 'extra spaces in Fragrance', 'warning', changed.sum(), 'removed', pd.unique(stripped[codes[changed]]))
+    df['Fragrance'] = stripped[codes]
+
+
+def _apply_rules(df, table, rules, report):
+    for check, level, rows, fix in rules:
+        mask = rows(df).fillna(False).to_numpy(dtype=bool)
+        if not mask.any():
+            continue
+        examples = _fragrances(df, mask)
+        if fix == 'drop':
+            df = df[~mask].copy()
+            action = 'dropped'
+        else:
+            for col, value in fix.items():
+                df.loc[mask, col] = np.nan if value is None else value
+            action = ', '.join(f"{col} set to {'missing' if value is None else value}" for col, value in fix.items())
+        report.add(table, check, level, mask.sum(), action, examples)
+    return df
+
+
+def _resolve_bottles(wears, report):
+    """One mL and Backups per fragrance: the latest sheet's, which is what starting mL is counted from."""
+    order = np.argsort(wears['sheet_name'].astype(str).to_numpy(), kind='stable')
+    latest = wears.iloc[order].groupby('Fragrance', sort=False)[['mL', 'Backups']].last()
+    latest = latest.reindex(wears['Fragrance'].to_numpy())
+    ml, backups = latest['mL'].to_numpy(), latest['Backups'].to_numpy()
+    mismatched = (wears['mL'].to_numpy() != ml) | (wears['Backups'].to_numpy() != backups)
+    if mismatched.any():
+        report.add('wears', 'mL or Backups differ between sheets', 'warning', mismatched.sum(),
+                   "set to the latest sheet's", _fragrances(wears, mismatched))
+        wears['mL'] = ml
+        wears['Backups'] = backups
+    return wears
+
+
+def _join_names(catalog, wears, report):
+    """Spell wears fragrances as the catalog does when they only differ in case or spacing."""
+    catalog_names = pd.Index(catalog['Fragrance'].to_numpy(dtype=object))
+    unknown = ~wears['Fragrance'].isin(catalog_names).to_numpy()
+    if unknown.any():
+        keys = _name_key(catalog['Fragrance'])
+        spellings = pd.Series(catalog['Fragrance'].to_numpy(dtype=object), index=keys.to_numpy())
+        spellings = spellings[~spellings.index.duplicated(keep=False)]
+        matched = _name_key(wears['Fragrance'][unknown]).map(spellings)
+        renamed = matched.notna().to_numpy()
+        if renamed.any():
+            rows = np.flatnonzero(unknown)[renamed]
+            names = [f"{old} -> {new}" for old, new in dict(zip(wears['Fragrance'].iloc[rows], matched[renamed])).items()]
+            report.add('wears', 'Fragrance spelled differently from the catalog', 'warning', renamed.sum(),
+                       "renamed to the catalog's spelling", names)
+            fragrances = wears['Fragrance'].to_numpy(dtype=object).copy()
+            fragrances[rows] = matched[renamed].to_numpy()
+            wears['Fragrance'] = fragrances
+            unknown[rows] = False
+        if unknown.any():
+            report.add('wears', 'Fragrance not in the catalog', 'error', unknown.sum(),
+                       'kept, not shown on any page', _fragrances(wears, unknown))
+    untracked = ~catalog['Fragrance'].isin(pd.Index(wears['Fragrance'].to_numpy(dtype=object))).to_numpy()
+    if untracked.any():
+        report.add('catalog', 'no wears tracked', 'info', untracked.sum(), 'none', _fragrances(catalog, untracked))
+    return wears
+
+
+def validate(catalog, wears_df):
+    """
+    Check and clean the catalog and wears tables together.
+
+    Every check is vectorized over whole columns. The input frames are not modified; the clean
+    ones are compacted to the schema types and frozen (see schema.py), and keep the input's row
+    labels.
+
+    Args:
+        catalog (pd.DataFrame): The catalog, as from loader.load_catalog().
+        wears_df (pd.DataFrame): The wears table, as from WearsFunctions.read_wears().
+
+    Returns:
+        tuple: A tuple containing the following elements:
+            - pd.DataFrame: The clean catalog.
+            - pd.DataFrame: The clean wears table.
+            - ValidationReport: What was found and fixed.
+
+    Raises:
+        ValidationError: A table is missing a column in REQUIRED.
+    """
+    report = ValidationReport()
+    catalog = catalog.copy()
+    wears = wears_df.copy()
+    _check_columns(catalog, 'catalog', schema.CATALOG, report)
+    _check_columns(wears, 'wears', schema.WEARS, report)
+
+    _strip_names(catalog, 'catalog', report)
+    _strip_names(wears, 'wears', report)
+    catalog = _apply_rules(catalog, 'catalog', CATALOG_RULES, report)
+    wears = _apply_rules(wears, 'wears', WEARS_RULES, report)
+    wears = _resolve_bottles(wears, report)
+    wears = _join_names(catalog, wears, report)
+
+    catalog['Retail $/mL'] = catalog['$'].astype('float64') / catalog['mL'].astype('float64')
+    # split once per distinct Type
+    codes, types = pd.factorize(catalog['Type'].astype(object))
+    first_words = pd.Series(types, dtype=object).str.split().str[0].to_numpy(dtype=object)
+    catalog['First_Word_Type'] = np.append(first_words, np.nan)[codes]
+    return _finish(catalog, schema.CATALOG), _finish(wears, schema.WEARS), report
+
+
+def _finish(df, columns):
+    # categories only found in dropped rows would still show up in groupbys and filters
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+    return schema.freeze(schema.compact(df, columns))
+
+
+def main():
+    # imported here, loader and wears aren't needed to validate frames
+    import loader
+    from wears import WearsFunctions
+
+    catalog, wears_df, report = validate(loader.load_catalog(), WearsFunctions.read_wears())
+    print(f"catalog: {len(catalog)} fragrances, wears: {len(wears_df)} rows")
+    print(report.summary())
+    if report.errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+import concurrent.futures
+import datetime
+import logging
+import os
+import threading
+
+import loader
+import schema
+import validation
+from consumption import AtomizerProfiles, SpendLedger
+from facets import FacetIndex
+from search import SearchIndex
+from similar import SimilarityIndex
+from wears import WearsFunctions, WearsIndex
+
+# Seconds between checks of the workbooks. A check is one os.stat per file.
+WATCH_INTERVAL = float(os.environ.get('CLUBSMELL_WATCH_INTERVAL', 5))
+
+log = logging.getLogger(__name__)
+
+
+class Dataset:
+    """
+    One fully built version of the data: the cleaned tables and the indexes built from them.
+
+    Built in one go and never modified afterwards, so a rerun that got a Dataset can keep
+    using it while a newer one is built. Everything it hands out is shared by every session
+    and read-only: the tables are frozen (see schema.freeze), and wear log updates swap in
+    new wears_index state instead of changing what a rerun may be reading.
+
+    Attributes:
+        version (str): loader.fingerprint() of both workbooks when the build started.
+        catalog (pd.DataFrame): loader.load_catalog() output, cleaned by validation.validate().
+        wears (pd.DataFrame): WearsFunctions.read_wears() output, cleaned by validation.validate().
+        report (validation.ValidationReport): What the validation found and fixed.
+        facets (FacetIndex): Sidebar options for catalog.
+        search (SearchIndex): Search index of catalog.
+        similar (SimilarityIndex): Neighbours of each fragrance in catalog.
+        wears_index (WearsIndex): Index of wears.
+        built (datetime.datetime): When the build finished.
+    """
+
+    def __init__(self, version, catalog, wears, report=None):
+        self.version = version
+        self.catalog = catalog
+        self.wears = wears
+        self.report = report if report is not None else validation.ValidationReport()
+        self.facets = FacetIndex.of(catalog)
+        self.search = SearchIndex.of(catalog)
+        self.similar = SimilarityIndex.of(catalog)
+        self.wears_index = WearsIndex.of(wears)
+        self.built = datetime.datetime.now()
+
+    def projection(self, today=None):
+        """
+        WearsFunctions.project_all() of this data, computed once per wear log update, day and
+        atomizer profiles instead of on every rerun of every session. Frozen, copy it to modify it.
+        """
+        if today is None:
+            today = datetime.date.today()
+        profiles = AtomizerProfiles.current()
+        key = (self.version, self.wears_index.data_version, today, profiles.version)
+        return loader.memoize('projection', key, lambda: schema.freeze(
+            WearsFunctions.project_all(self.wears, self.catalog, today, profiles, self.wears_index,
+                                       SpendLedger.of(self.catalog, self.wears, profiles, self.version))))
+
+    def ledger(self):
+        """The consumption.SpendLedger of this data, per wear log update and atomizer profiles."""
+        return SpendLedger.of(self.catalog, self.wears, version=self.version)
+
+
+class DataWatcher:
+    """
+    Watches the workbooks and rebuilds the Dataset in a background thread when they change.
+
+    Reruns call current() and get the latest fully built Dataset. Only the very first call
+    (a cold start) parses the workbooks itself; after that an edited workbook is parsed off
+    the request path, and the new Dataset replaces the old one in a single assignment, so a
+    rerun sees either the old or the new version, never a mix of the two.
+
+    A change is only picked up once the files have stayed the same for a whole interval, so a
+    workbook that is still being saved isn't parsed. If a rebuild fails the old Dataset keeps
+    being served and the build is retried on the next change.
+
+    Attributes:
+        catalog_file (str): Catalog workbook.
+        wears_file (str): Wears workbook.
+        interval (float): Seconds between checks.
+        reloads (int): Datasets built so far.
+        error (Exception): Why the last rebuild failed, None if it didn't.
+    """
+
+    def __init__(self, catalog_file=loader.CATALOG_FILE, wears_file=loader.WEARS_FILE, interval=WATCH_INTERVAL):
+        self.catalog_file = catalog_file
+        self.wears_file = wears_file
+        self.interval = interval
+        self.reloads = 0
+        self.error = None
+        self._current = None
+        self._build_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def version(self):
+        """Fingerprint of both workbooks, changes when either is edited."""
+        return loader.fingerprint(self.catalog_file, self.wears_file)
+
+    def current(self):
+        """The latest built Dataset, starting the watcher thread on first use."""
+        if self._current is None:
+            self.reload()
+        if self._thread is None:
+            self.start()
+        return self._current
+
+    def reload(self):
+        """
+        Build a Dataset from the workbooks if they changed since the current one.
+
+        Returns:
+            bool: True if a new Dataset was built and swapped in.
+        """
+        with self._build_lock:
+            version = self.version()
+            if self._current is not None and self._current.version == version:
+                return False
+            # both workbooks at once: their sheets share loader's parse pool when they need parsing
+            with concurrent.futures.ThreadPoolExecutor(2) as loads:
+                catalog = loads.submit(loader.load_catalog, self.catalog_file)
+                wears = loads.submit(WearsFunctions.read_wears, self.wears_file)
+                catalog, wears = catalog.result(), wears.result()
+            # checked and cleaned once here, so reruns use the tables as they are
+            catalog, wears, report = validation.validate(catalog, wears)
+            if report.errors:
+                log.warning("The workbooks have errors, see python validation.py:\n%s", report.summary())
+            dataset = Dataset(version, catalog, wears, report)
+            self._current = dataset
+            self.reloads += 1
+            return True
+
+    def start(self):
+        """Start the watcher thread, if it isn't running."""
+        with self._build_lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name='clubsmell-data-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the watcher thread. current() keeps serving the last Dataset."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        seen = None
+        failed = None
+        while not self._stop.wait(self.interval):
+            try:
+                version = self.version()
+            except OSError:
+                # a workbook being replaced can be missing for a moment
+                continue
+            if version == failed or (self._current is not None and version == self._current.version):
+                seen = None
+                continue
+            if version != seen:
+                # changed since the last check, wait for it to settle
+                seen = version
+                continue
+            try:
+                self.reload()
+                self.error = None
+            except Exception as e:
+                self.error = e
+                failed = version
+                log.warning("Reloading the workbooks failed, still serving the previous data: %r", e)
+            seen = None
+
+
+# shared by every session of the app
+DATA = DataWatcher()
@@ -0,0 +1,178 @@
+import datetime
+import math
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import loader
+from consumption import AtomizerProfiles
+
+# The "Wears for" sheets only hold one total per fragrance per sheet. Each becomes one event in
+# the middle of the period the sheet covers; a sheet covering several years ('Wears for 2021-2022')
+# is split evenly between them, rounding the earlier years down. Wear log entries keep their date.
+TRACKING_START = datetime.date(2021, 7, 28)  # 'Wears Since 07/28/21' in the Wears sheet
+
+# how fast old wears stop counting towards the wear rate: a wear this many days old counts half
+RATE_HALF_LIFE_DAYS = float(os.environ.get('CLUBSMELL_RATE_HALF_LIFE_DAYS', 365))
+
+FREQUENCIES = {'daily': 'D', 'weekly': 'W', 'monthly': 'M', 'yearly': 'Y'}
+
+
+def _sheet_period(year, today):
+    """First and middle day of the part of a year the wears sheets cover."""
+    start = max(datetime.date(year, 1, 1), TRACKING_START)
+    end = max(min(datetime.date(year, 12, 31), today), start)
+    return start, start + (end - start) / 2
+
+
+class WearEvents:
+    """
+    Wears as dated events, with cumulative rollups per fragrance by day, week, month and year.
+
+    Built from a WearsIndex: the workbook rows it was built from plus the wear log entries it
+    ingested. Events are sorted by fragrance then date and each rollup is computed once, so a
+    fragrance's cumulative wears over time is a slice of a prebuilt frame.
+
+    Attributes:
+        today (datetime.date): Date the events and rates are for.
+        events (pd.DataFrame): 'Fragrance' (categorical), 'Date', 'Start' (first day of the period
+            the event stands for, the date itself for logged wears), 'Wears' and 'Sprays' (from
+            the fragrance's atomizer profile, see consumption.py).
+    """
+
+    def __init__(self, index, today=None, profiles=None):
+        if today is None:
+            today = datetime.date.today()
+        if profiles is None:
+            profiles = AtomizerProfiles.current()
+        self.today = today
+        fragrances = pd.Index(index.totals.index, dtype=object)
+
+        parts = []
+        rows = index.wears_df
+        for sheet, sheet_rows in rows.groupby("sheet_name", sort=False, observed=True):
+            years = [int(year) for year in re.findall(r'\d{4}', str(sheet))]
+            wears = sheet_rows["Wears"].to_numpy(dtype=float)
+            share = np.floor(wears / max(len(years), 1))
+            for i, year in enumerate(years):
+                start, middle = _sheet_period(year, today)
+                parts.append(pd.DataFrame({
+                    "Fragrance": sheet_rows["Fragrance"].to_numpy(),
+                    "Date": pd.Timestamp(middle),
+                    "Start": pd.Timestamp(start),
+                    "Wears": share if i < len(years) - 1 else wears - share * (len(years) - 1),
+                }))
+        if index.log_entries:
+            dates = pd.to_datetime([date for date, _, _ in index.log_entries])
+            parts.append(pd.DataFrame({
+                "Fragrance": [frag for _, frag, _ in index.log_entries],
+                "Date": dates,
+                "Start": dates,
+                "Wears": [float(wears) for _, _, wears in index.log_entries],
+            }))
+
+        events = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+            {"Fragrance": [], "Date": pd.to_datetime([]), "Start": pd.to_datetime([]), "Wears": []})
+        events["Fragrance"] = pd.Categorical(events["Fragrance"], categories=fragrances)
+        codes = events["Fragrance"].cat.codes.to_numpy()
+        events = events.iloc[np.lexsort((events["Date"].to_numpy(), codes))].reset_index(drop=True)
+        _, sprays_per_wear = profiles.arrays(fragrances)
+        codes = events["Fragrance"].cat.codes.to_numpy()
+        events["Sprays"] = events["Wears"].to_numpy() * np.where(codes >= 0, sprays_per_wear[codes], profiles.sprays_per_wear)
+        self.events = events
+
+        self._codes = {frag: i for i, frag in enumerate(fragrances)}
+        self._rollups = {}
+        self._rates = {}
+
+    @staticmethod
+    def of(wears_df, today=None):
+        """Events for wears_df, built once per data version (wear log updates included), day and atomizer profiles."""
+        # imported here, wears.py uses this module
+        from wears import WearsIndex
+        index = WearsIndex.of(wears_df)
+        if today is None:
+            today = datetime.date.today()
+        profiles = AtomizerProfiles.current()
+        return loader.memoize("wear_events", (index.data_version, today, profiles.version),
+                              lambda: WearEvents(index, today, profiles))
+
+    def rollup(self, freq='yearly'):
+        """
+        Wears and cumulative wears per fragrance per period.
+
+        Args:
+            freq (str): 'daily', 'weekly', 'monthly' or 'yearly'.
+
+        Returns:
+            pd.DataFrame: 'Fragrance', 'Period', 'Wears' and 'Cumulative Wears', sorted by fragrance
+                then period, with a row only for periods that had events. Shared, don't modify it.
+        """
+        if freq not in self._rollups:
+            events = self.events
+            period = events["Date"].dt.to_period(FREQUENCIES[freq]).rename("Period")
+            totals = events.groupby([events["Fragrance"], period], observed=True, sort=True)["Wears"].sum()
+            frame = totals.reset_index()
+            frame["Cumulative Wears"] = frame.groupby("Fragrance", observed=True)["Wears"].cumsum()
+            bounds = np.searchsorted(frame["Fragrance"].cat.codes.to_numpy(), np.arange(len(self._codes) + 1))
+            self._rollups[freq] = (frame, bounds)
+        return self._rollups[freq][0]
+
+    def slice(self, frag, freq='yearly'):
+        """One fragrance's rows of rollup(freq), without scanning the others."""
+        self.rollup(freq)
+        frame, bounds = self._rollups[freq]
+        code = self._codes.get(frag)
+        if code is None:
+            return frame.iloc[0:0]
+        return frame.iloc[bounds[code]:bounds[code + 1]]
+
+    def rates(self, half_life_days=RATE_HALF_LIFE_DAYS):
+        """
+        Wears per year per fragrance, weighting recent wears more.
+
+        Every wear is weighted by 0.5 ** (age in days / half_life_days). The weighted wears are
+        divided by the weighted number of days since the fragrance's first wear, so a constant rate
+        comes out as itself and a fragrance worn a lot lately gets a higher rate than its all time
+        average.
+
+        The workbook has no purchase dates and the sheets only hold yearly totals, so the first
+        wear is estimated: the n wears of the fragrance's first period (a sheet's year, from
+        TRACKING_START for 2021) are taken as spread evenly over it, the first of them
+        1 / (n + 1) of the way in. A fragrance worn a lot in its first year starts near the start of
+        that year, one worn once starts at its middle; a logged wear is its own date. Starting at the
+        first day of the first period instead made fragrances bought during a year look worn less
+        than they are.
+
+        Args:
+            half_life_days (float, optional): Age at which a wear counts half.
+
+        Returns:
+            pd.Series: Wears per year, indexed by fragrance like WearsIndex.totals. Shared, don't modify it.
+        """
+        if half_life_days not in self._rates:
+            self._rates[half_life_days] = self._build_rates(half_life_days)
+        return self._rates[half_life_days]
+
+    def _build_rates(self, half_life_days):
+        events = self.events
+        today = pd.Timestamp(self.today)
+        decay = math.log(2) / half_life_days
+        codes = events["Fragrance"].cat.codes.to_numpy()
+        n = len(self._codes)
+
+        age = (today - events["Date"]).dt.days.to_numpy(dtype=float)
+        weighted = np.bincount(codes, weights=events["Wears"].to_numpy() * np.exp(-decay * age), minlength=n)
+
+        # events are sorted by fragrance then date: the first worn one of each fragrance is its first period
+        worn = events[events["Wears"].to_numpy() > 0]
+        first = worn.groupby("Fragrance", observed=False).head(1)
+        first_wear = first["Start"] + (first["Date"] - first["Start"]) * 2 / (first["Wears"] + 1)
+        starts = pd.Series(first_wear.to_numpy(), index=first["Fragrance"].to_numpy()).reindex(
+            pd.Index(self._codes, dtype=object))
+        tracked_days = np.maximum((today - starts).dt.days.to_numpy(dtype=float), 1)
+        exposure = (1 - np.exp(-decay * tracked_days)) / decay
+        with np.errstate(invalid="ignore"):
+            return pd.Series(weighted / exposure * 365, index=starts.index)
@@ -0,0 +1,138 @@
+import collections
+import csv
+import datetime
+import io
+import logging
+import os
+import sys
+
+import loader
+
+# Append-only log of wears recorded since the wears workbook was last updated, one line per wear day:
+#   Date,Fragrance,Wears
+#   2024-02-04,Cuir Beluga,1
+# The app replays it on top of the "Wears for" sheets. Once the wears are copied into the workbook,
+# clear the log (the edited workbook gets a new cache version, so nothing is counted twice; until
+# the log is cleared the copied wears count twice). Clearing, editing or replacing the log is
+# noticed on the next read, and what was read of it before no longer counts.
+
+WEAR_LOG_FILE = os.path.join(loader.BASE_DIR, 'wear_log.csv')
+LOG_COLUMNS = ['Date', 'Fragrance', 'Wears']
+
+# bytes kept of the start of the log and of the end of what was read, to tell it is still the same log
+HEAD_BYTES = 256
+TAIL_BYTES = 64
+
+log = logging.getLogger(__name__)
+
+
+class LogPosition(collections.namedtuple('LogPosition', ['offset', 'file_id', 'mtime_ns', 'head', 'tail'])):
+    """
+    How far a log was read, and enough of it to recognise it next time: its device and inode, its
+    modification time, its first HEAD_BYTES bytes and the TAIL_BYTES bytes before offset.
+    """
+
+
+START = LogPosition(0, None, None, b'', b'')
+
+
+def append_wear(fragrance, wears=1, date=None, log_file=WEAR_LOG_FILE):
+    """
+    Record wears for one fragrance at the end of the log.
+
+    Args:
+        fragrance (str): Fragrance name, as in the "Wears for" sheets.
+        wears (int, optional): Number of wears. Defaults to 1.
+        date (datetime.date, optional): Day of the wear. Defaults to today.
+        log_file (str, optional): Path to the log.
+    """
+    if date is None:
+        date = datetime.date.today()
+    new_file = not os.path.exists(log_file) or os.path.getsize(log_file) == 0
+    with open(log_file, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(LOG_COLUMNS)
+        writer.writerow([date.isoformat(), fragrance, wears])
+
+
+def _same_log(f, stat, position):
+    """Whether the open log f is still the log position was read from, with those bytes unchanged."""
+    if (stat.st_dev, stat.st_ino) != position.file_id or stat.st_size < position.offset:
+        return False
+    if f.read(len(position.head)) != position.head:
+        return False
+    f.seek(position.offset - len(position.tail))
+    return f.read(len(position.tail)) == position.tail
+
+
+def read_wear_log(log_file=WEAR_LOG_FILE, position=None):
+    """
+    Read the log entries appended since a previous read.
+
+    Only the bytes after the position are read, so polling the log costs work proportional to
+    what was appended, and a log that hasn't changed costs one os.stat. A trailing line without a
+    newline (still being written) is left for the next call.
+
+    If the log is no longer the one position was read from (deleted, cleared, replaced by a
+    new file, or its start or the last lines read changed, e.g. cleared and logged to again
+    past the old position) it is read from the start, and replaced is True: entries read from
+    it before no longer count.
+
+    Lines that aren't a date, a fragrance and a whole number of wears (e.g. edited by hand) are
+    skipped with a warning and returned, and the position still moves past them, so one bad line
+    doesn't stop the lines after it from being read.
+
+    Args:
+        log_file (str, optional): Path to the log.
+        position (LogPosition, optional): Position returned by the previous call. Defaults to START.
+
+    Returns:
+        tuple: A tuple containing the following elements:
+            - list: (datetime.date, fragrance, wears) tuples, in log order.
+            - LogPosition: Position to pass to the next call.
+            - list: The skipped lines, as lists of their cells.
+            - bool: Whether the log was replaced since position and read from the start.
+    """
+    if position is None:
+        position = START
+    try:
+        stat = os.stat(log_file)
+    except FileNotFoundError:
+        return [], START, [], position.offset > 0
+    file_id = (stat.st_dev, stat.st_ino)
+    if file_id == position.file_id and stat.st_size == position.offset and stat.st_mtime_ns == position.mtime_ns:
+        return [], position, [], False
+
+    with open(log_file, 'rb') as f:
+        replaced = position.offset > 0 and not _same_log(f, stat, position)
+        offset = 0 if replaced else position.offset
+        f.seek(offset)
+        chunk = f.read()
+        end = offset + chunk.rfind(b'\n') + 1
+        f.seek(0)
+        head = f.read(min(end, HEAD_BYTES))
+        f.seek(max(end - TAIL_BYTES, 0))
+        tail = f.read(end - max(end - TAIL_BYTES, 0))
+    if replaced:
+        log.warning("%s was cleared or replaced, reading it from the start", log_file)
+    position = LogPosition(end, file_id, stat.st_mtime_ns, head, tail)
+
+    entries = []
+    skipped = []
+    for row in csv.reader(io.StringIO(chunk[:end - offset].decode('utf-8', errors='replace'))):
+        if not row or row == LOG_COLUMNS:
+            continue
+        try:
+            date, fragrance, wears = row
+            entries.append((datetime.date.fromisoformat(date), fragrance, int(wears)))
+        except ValueError:
+            skipped.append(row)
+    if skipped:
+        log.warning("%s: skipped %d malformed lines, e.g. %s", log_file, len(skipped), ','.join(skipped[0]))
+    return entries, position, skipped, replaced
+
+
+if __name__ == '__main__':
+    # python wear_log.py "Cuir Beluga" [wears]
+    append_wear(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 1)
@@ -1,40 +1,69 @@
 import pandas as pd
-import plotly.express as px
 import numpy as np
-import os
 import datetime
 import math
+import threading
+import itertools
+import logging
+import weakref
+
+import loader
+import schema
+import wear_log
+from consumption import AtomizerProfiles, SpendLedger
+from wear_events import TRACKING_START, WearEvents
+from figure_cache import FIGURES
+
+# plotly is imported by the functions that build figures, not here: it is a large share of the
+# app's import time, and with the figure cache most reruns never build a figure
+
+log = logging.getLogger(__name__)
+
+# bottle fills are rounded to whole percents, so bottle figures can be shared from the cache
+BOTTLE_FILL_BUCKETS = 100
+
 
 class WearsFunctions:
-    def read_wears():
+    def read_wears(excel_file=None):
         """
-        Read fragrance wear data from Excel sheets.
+        Read fragrance wear data, served from the parquet cache when the workbook hasn't changed.
 
-        Reads all sheets from the Excel file 'Copy of Silly_Fragrance_excel.xlsx' and concatenates them
-        into a single DataFrame. Filters out rows where 'Wears' is equal to 0 and removes any unnamed columns.
+        The excel file is only parsed (see parse_wears) the first time, or after it is edited.
+        Columns are compacted to schema.WEARS and the frame is read-only.
+
+        Args:
+            excel_file (str, optional): Path to the wears workbook. Defaults to 'Copy of Silly_Fragrance_excel.xlsx'.
 
         Returns:
             pd.DataFrame: A DataFrame containing fragrance wear data with a new column 'sheet_name'.
         """
-        #excel_file='Copy of Silly_Fragrance_excel.xlsx'
-        excel_file = os.path.join(os.path.dirname(__file__), 'Copy of Silly_Fragrance_excel.xlsx')
+        if excel_file is None:
+            excel_file = loader.WEARS_FILE
+        return loader.cached_frame('wears', excel_file, lambda: WearsFunctions.parse_wears(excel_file), schema.WEARS)
 
+    def parse_wears(excel_file, columns=schema.WEARS, workers=None):
+        """
+        Read fragrance wear data from Excel sheets.
 
-        # Read all sheets into a dictionary
-        all_sheets = pd.read_excel(excel_file, sheet_name=None)
+        Streams the 'Wears for' sheets of the Excel file 'Copy of Silly_Fragrance_excel.xlsx'
+        (loader.read_sheets, one worker process per sheet for big workbooks), reading only the
+        wanted columns, and concatenates them into a single DataFrame in sheet name order. Other
+        sheets and unnamed columns are never parsed. Rows with 0 wears are dropped by validation.validate().
 
-        # Filter sheets containing 'Wears for'
-        wears_sheets = {sheet_name: sheet_df for sheet_name, sheet_df in all_sheets.items() if 'Wears for' in sheet_name}
+        Args:
+            excel_file (str): Path to the wears workbook.
+            columns (iterable, optional): Columns to read, None for all of them. Defaults to the schema's.
+            workers (int, optional): Worker processes, 1 to parse serially. Defaults to loader.PARSE_WORKERS.
 
+        Returns:
+            pd.DataFrame: A DataFrame containing fragrance wear data with a new column 'sheet_name'.
+        """
         #sort ascending, so that is in order by each year 2021-2022, 2023, 2024
-        wears_sheets_ordered = dict(sorted(wears_sheets.items()))
+        sheet_names = sorted(name for name in loader.sheet_names(excel_file) if 'Wears for' in name)
+        sheets = loader.read_sheets([(excel_file, sheet_name, columns) for sheet_name in sheet_names], workers)
 
         # Concatenate all DataFrames into one DataFrame with a new column 'sheet_name'
-        wears_df = pd.concat([df.assign(sheet_name=sheet_name) for sheet_name, df in wears_sheets_ordered.items()], ignore_index=True)
-        wears_df=wears_df.dropna(how='all')
-        wears_df = wears_df.loc[:, ~wears_df.columns.str.contains('^Unnamed')]
-        wears_df = wears_df[wears_df['Wears'] != 0]
-        return wears_df
+        return pd.concat([sheet.assign(sheet_name=sheet_name) for sheet_name, sheet in zip(sheet_names, sheets)], ignore_index=True)
 
 
 
@@ -42,9 +71,10 @@ class WearsFunctions:
         """
         Summarize fragrance wear data for a specific fragrance.
 
-        Groups the DataFrame by fragrance and calculates the sum of 'Wears' for each fragrance.
+        Looks the fragrance up in the WearsIndex for wears_df (built on first use) instead of
+        grouping the whole DataFrame on every call.
         Returns the total wears, rank based on total wears, and estimates the leftover milliliters
-        of fragrance based on assumptions of sprays per milliliter and sprays per wear.
+        of fragrance from its sprays per milliliter and sprays per wear (consumption.AtomizerProfiles).
 
         Args:
             wears_df (pd.DataFrame): DataFrame containing fragrance wear data.
@@ -59,30 +89,24 @@ class WearsFunctions:
         """
 
 
-        wears_allsum=wears_df.groupby(['Fragrance'])['Wears'].sum()
-        if frag not in wears_allsum.index:
-            print(f"Wears not tracked for fragrance: {frag}")
+        index = WearsIndex.of(wears_df)
+        if frag not in index:
+            log.warning("Wears not tracked for fragrance: %s", frag)
             return None  # or any other value indicating not tracked
 
-        frag_wears_alltime=wears_allsum[frag]
-        rank= int(wears_allsum.rank(ascending=False)[frag])
-
-        total_ml_df=wears_df[wears_df["Fragrance"]==frag]["mL"] +(wears_df[wears_df["Fragrance"]==frag]["mL"] * wears_df[wears_df["Fragrance"]==frag]["Backups"])
-        total_ml=total_ml_df.unique()
-
-        # if total_ml no consensus amongst Wears tabs, take the last one -1 (most recent). 
-        # if consensus, 0 to grab the only value
-        # assume 12 sprays per mL. 4 sprays per wear. So 1 wear is 4/12 of a mL
-        if len(total_ml) >1:
-            starting_ml=total_ml[-1]
+        frag_wears_alltime=index.totals[frag]
+        rank=index.rank(frag)
 
-        else:
-            starting_ml=total_ml[0]
-        leftover_ml=starting_ml-(frag_wears_alltime*4/12)
-        return frag_wears_alltime,rank, leftover_ml,wears_df[wears_df["Fragrance"]==frag], starting_ml
+        # mL + mL*Backups per fragrance; if no consensus amongst Wears tabs, the index keeps the most recent
+        # by default 12 sprays per mL, 4 sprays per wear. So 1 wear is 4/12 of a mL
+        sprays_per_ml, sprays_per_wear=AtomizerProfiles.current().of(frag)
+        starting_ml=index.starting_ml[frag]
+        leftover_ml=starting_ml-(frag_wears_alltime*sprays_per_wear/sprays_per_ml)
+        return frag_wears_alltime,rank, leftover_ml,index.rows(frag), starting_ml
 
 
     def plot_wears (plot_df,starting_ml):
+        import plotly.express as px
         plot_df["Year"]=plot_df["sheet_name"].str.extract('(\d{4})')
         plot_df.loc[plot_df['Year'] == '2021', 'Wears'] /= 2
         # Filter rows where Year is 2021
@@ -136,25 +160,172 @@ class WearsFunctions:
         return fig_cumulative_wears, slope
 
 
-    def all_wears_plot (selected_fragrance,wears_df):
+    def project_all(wears_df, df=None, today=None, profiles=None, index=None, ledger=None):
+        """
+        Project consumption and run out year for every tracked fragrance at once.
 
-        sorted_df = wears_df.groupby(["Fragrance"])["Wears"].sum().reset_index().sort_values(by='Wears', ascending=False).reset_index()
+        Computed as numpy arrays over the WearsIndex instead of per fragrance, with the mL and
+        cost per wear of the consumption.SpendLedger. The wear rate is WearEvents.rates(): wears
+        per year with recent wears weighted more, so a fragrance that has been in heavy rotation
+        lately runs out sooner than its all time average suggests.
 
-        # Create a bar plot
-        fig = px.bar(sorted_df, x='Fragrance', y='Wears', title='Wears by Fragrance (Descending Order)')
+        Args:
+            wears_df (pd.DataFrame): DataFrame containing fragrance wear data.
+            df (pd.DataFrame, optional): The catalog, for cost per wear. Left out if not given.
+            today (datetime.date, optional): Date to project from. Defaults to today.
+            profiles (consumption.AtomizerProfiles, optional): Defaults to AtomizerProfiles.current().
+            index (WearsIndex, optional): The index of wears_df, e.g. a Dataset's. Defaults to WearsIndex.of(wears_df).
+            ledger (consumption.SpendLedger, optional): The ledger of df and wears_df with profiles, e.g. a
+                Dataset's. Defaults to SpendLedger.of(df, wears_df, profiles).
+
+        Returns:
+            pd.DataFrame: One row per tracked fragrance, with columns 'Fragrance', 'Wears', 'Starting mL',
+                'Remaining mL', 'Bottles', 'Bottles Left' (sum of bottle fills), 'Wears per Year', 'Year to Run out' and 'Cost per Wear', soonest run out first.
+        """
+        if index is None:
+            index = WearsIndex.of(wears_df)
+        if today is None:
+            today = datetime.date.today()
+
+        fragrances = index.totals.index
+        starting_ml = index.starting_ml.reindex(fragrances).to_numpy(dtype=float)
+
+        if ledger is None:
+            ledger = SpendLedger.of(df, wears_df, profiles)
+        remaining_ml = ledger.values("Remaining mL", fragrances)
+        ml_per_wear = ledger.values("mL per Wear", fragrances)
+        wears_per_year = WearEvents.of(wears_df, today).rates().reindex(fragrances).to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            year_empty = np.round(today.year + remaining_ml / (wears_per_year * ml_per_wear))
+        year_empty = pd.array(np.where(np.isfinite(year_empty), year_empty, np.nan), dtype="Int64")
+
+        num_bottles = index.backups.reindex(fragrances).to_numpy() + 1
+        fills = WearsFunctions.bottle_fills(
+            remaining_ml, starting_ml, index.bottle_ml.reindex(fragrances).to_numpy(), num_bottles
+        )
+
+        projection = pd.DataFrame({
+            "Fragrance": fragrances,
+            "Wears": index.totals.to_numpy(),
+            "Starting mL": starting_ml,
+            "Remaining mL": remaining_ml,
+            "Bottles": num_bottles,
+            "Bottles Left": np.nansum(fills, axis=1),
+            "Wears per Year": wears_per_year,
+            "Year to Run out": year_empty,
+        })
+        if df is not None:
+            projection["Cost per Wear"] = ledger.values("Cost per Wear", fragrances)
+
+        return projection.sort_values(by=["Year to Run out", "Remaining mL"], kind="stable").reset_index(drop=True)
 
 
+    def cumulative_wears_plot(selected_fragrance, wears_df, today=None):
+        """
+        Cumulative wears per year for one fragrance, the chart plot_wears draws.
 
-        # Highlight the bar for the selected fragrance
-        highlighted_bar_index = sorted_df[sorted_df['Fragrance'] == selected_fragrance].index[0]
-        #display(sorted_df[sorted_df['Fragrance'] == selected_fragrance].index)
-        colors = ['gold' if i == highlighted_bar_index else 'black' for i in range(len(sorted_df))]
-        fig.data[0].marker.color = colors
+        Sliced from the yearly rollup of WearEvents instead of copying, concatenating and summing
+        the fragrance's rows per view, and kept in the figure cache per data version and day
+        (the current year's width grows daily). Don't modify the result.
 
+        Args:
+            selected_fragrance (str): The fragrance to plot.
+            wears_df (pd.DataFrame): DataFrame containing fragrance wear data.
+            today (datetime.date, optional): Defaults to today.
 
-        variable2=sorted_df.index.max()
+        Returns:
+            tuple: The plotly figure and the slope (cumulative wears per year since 2021).
+        """
+        index = WearsIndex.of(wears_df)
+        if today is None:
+            today = datetime.date.today()
+        key = ("cumulative_wears", selected_fragrance, index.data_version, today)
+        return FIGURES.get(key, lambda: WearsFunctions.build_cumulative_wears(
+            WearEvents.of(wears_df, today).slice(selected_fragrance, 'yearly'), today
+        ))
+
+    def build_cumulative_wears(yearly, today):
+        import plotly.express as px
+        plot_df = pd.DataFrame({
+            "Year": yearly["Period"].dt.year.to_numpy(dtype=int),
+            "Cumulative Wears": yearly["Cumulative Wears"].to_numpy(dtype=float),
+        })
+        # fragrances tracked from the start get a line from 0 the year before
+        if len(plot_df) and plot_df["Year"].iloc[0] == TRACKING_START.year:
+            start = pd.DataFrame({"Year": [TRACKING_START.year - 1], "Cumulative Wears": [0.0]})
+            plot_df = pd.concat([start, plot_df], ignore_index=True)
+
+        plot_df["Years"]=plot_df['Year']
+        fraction_of_year_passed = today.timetuple().tm_yday / 365
+
+        # for this year, set plot year (Years) to last year + fraction of this year passed
+        # this sets the width of this year's x axis proportional to fraction of this year passed
+        plot_df.loc[plot_df['Year'] == today.year, 'Years'] = today.year-1+fraction_of_year_passed
+
+        fig_cumulative_wears = px.line(
+            plot_df,
+            x="Years",
+            y="Cumulative Wears",
+            title="Cumulative Wears per Year",
+            color_discrete_sequence=["#4111a4"],
+            template="plotly_white",
+        )
+
+        fig_cumulative_wears.update_layout(xaxis=dict(tickmode="linear", tickvals=plot_df['Year'].unique(), ticktext=plot_df['Year'].unique().astype(int)))
+
+        slope=plot_df["Cumulative Wears"].max()/(today.year+fraction_of_year_passed-2021)
+        return fig_cumulative_wears, slope
+
+    def all_wears_plot (selected_fragrance,wears_df):
+        """
+        Bar chart of all time wears per fragrance, with the selected fragrance's bar in gold.
+
+        The black bars are built once per data version (all_wears_base). Each selection only
+        copies that figure and overlays a single gold bar, so switching fragrances doesn't rebuild
+        every bar marker. Both figures are kept in the figure cache, don't modify the result.
+
+        Args:
+            selected_fragrance (str): The fragrance to highlight.
+            wears_df (pd.DataFrame): DataFrame containing fragrance wear data.
+
+        Returns:
+            plotly.graph_objects.Figure: The bar chart.
+        """
+        index = WearsIndex.of(wears_df)
+        key = ("all_wears", selected_fragrance, index.data_version)
+        return FIGURES.get(key, lambda: WearsFunctions.highlight_wears(selected_fragrance, index))
+
+    def highlight_wears(selected_fragrance, index):
+        import plotly.graph_objects as go
+        base = FIGURES.get(("all_wears_base", index.data_version), lambda: WearsFunctions.all_wears_base(index))
+        if selected_fragrance not in index:
+            return base
+
+        # Highlight the bar for the selected fragrance, by drawing a gold bar over its black one
+        highlighted_bar_index = index.position(selected_fragrance)
+        fig = go.Figure(base)
+        fig.add_trace(go.Bar(
+            x=[selected_fragrance],
+            y=[index.totals[selected_fragrance]],
+            marker_color='gold',
+            hovertemplate=base.data[0].hovertemplate,
+            showlegend=False
+        ))
         fig.update_layout(
-            title=f'All Time Wears Per Fragrance, Rank: {highlighted_bar_index + 1} out of {len(sorted_df)}',
+            title=f'All Time Wears Per Fragrance, Rank: {highlighted_bar_index + 1} out of {len(index.order)}'
+        )
+        return fig
+
+    def all_wears_base(index):
+        import plotly.express as px
+        sorted_df = index.order
+
+        # Create a bar plot
+        fig = px.bar(sorted_df, x='Fragrance', y='Wears', title='Wears by Fragrance (Descending Order)')
+        fig.data[0].marker.color = 'black'
+
+        fig.update_layout(
+            barmode='overlay',
             xaxis=dict(
                 tickangle=-45,  # Slant the labels
                 title=None,
@@ -165,6 +336,22 @@ class WearsFunctions:
         return fig
 
     def plot_bottles(percentage_filled,bottle_size):
+        """
+        Bottle drawing filled to percentage_filled (0-1), sized by bottle_size in mL.
+
+        The fill is rounded to whole percents (under a pixel at these sizes), so figures are shared
+        from the figure cache by every bottle with the same size and fill. Don't modify the result.
+        """
+        if percentage_filled >1:
+            percentage_filled=1
+        fill_bucket = round(percentage_filled * BOTTLE_FILL_BUCKETS)
+        return FIGURES.get(
+            ("bottle", fill_bucket, bottle_size),
+            lambda: WearsFunctions.build_bottle(fill_bucket / BOTTLE_FILL_BUCKETS, bottle_size)
+        )
+
+    def build_bottle(percentage_filled,bottle_size):
+        import plotly.express as px
 
         if percentage_filled >1:
             percentage_filled=1
@@ -233,41 +420,362 @@ class WearsFunctions:
 
 
 
+    def plot_bottle_stack(start_fills, remaining_fills, bottle_size):
+        """
+        Draw every bottle of a fragrance in one figure: starting bottles on the left, remaining on the right.
+
+        Replaces one plot_bottles chart per bottle, which sent backups+1 figures per column to the
+        browser. Bottles are drawn like plot_bottles (gold fill, white empty part, black cap) and stacked
+        top to bottom, at the same size plot_bottles gives a bottle_size mL bottle.
+
+        Args:
+            start_fills (list): Fill (0-1) of each bottle at the start, usually all 1.
+            remaining_fills (list): Fill (0-1) of each bottle now, e.g. from list_mult_bottles.
+            bottle_size (float): Size of one bottle in mL.
+
+        Returns:
+            plotly.graph_objects.Figure: The figure, shared from the figure cache so don't modify it.
+        """
+        start = tuple(round(min(fill, 1) * BOTTLE_FILL_BUCKETS) for fill in start_fills)
+        remaining = tuple(round(min(fill, 1) * BOTTLE_FILL_BUCKETS) for fill in remaining_fills)
+        return FIGURES.get(
+            ("bottle_stack", start, remaining, bottle_size),
+            lambda: WearsFunctions.build_bottle_stack(start, remaining, bottle_size)
+        )
+
+    def build_bottle_stack(start_buckets, remaining_buckets, bottle_size):
+        import plotly.graph_objects as go
+        row_height = 1.4
+        rows = max(len(start_buckets), len(remaining_buckets), 1)
+
+        fig = go.Figure()
+        for column, buckets in enumerate([start_buckets, remaining_buckets]):
+            for row, bucket in enumerate(buckets):
+                filled = 0.8 * bucket / BOTTLE_FILL_BUCKETS
+                x = column
+                y = -row * row_height
+                # gold fill, white empty part, black cap
+                fig.add_shape(type="rect", x0=x - 0.2, y0=y, x1=x + 0.2, y1=y + filled,
+                              fillcolor="gold", line=dict(color="black"))
+                fig.add_shape(type="rect", x0=x - 0.2, y0=y + filled, x1=x + 0.2, y1=y + 0.8,
+                              fillcolor="white", line=dict(color="black"))
+                fig.add_shape(type="rect", x0=x - 0.14, y0=y + 0.8, x1=x + 0.14, y1=y + 1.2,
+                              fillcolor="black", line=dict(color="black"))
+
+        for column, label in enumerate(["Start", "Now"]):
+            fig.add_annotation(x=column, y=1.3, text=label, showarrow=False, yanchor="bottom")
+
+        x_range = [-0.5, 1.5]
+        y_range = [-(rows - 1) * row_height - 0.1, 1.6]
+
+        # same scale as plot_bottles: a bottle row gets 1050*norm_mL_start pixels
+        norm_mL_start = math.sqrt( .1/5* (bottle_size) / (275))
+        px_per_unit = 1050 * norm_mL_start / row_height
+        fig.update_layout(
+            showlegend=False,
+            xaxis=dict(visible=False, range=x_range, fixedrange=True),
+            yaxis=dict(visible=False, range=y_range, fixedrange=True),
+            margin=dict(l=0, r=0, t=0, b=0),
+            plot_bgcolor="rgba(0,0,0,0)",
+            paper_bgcolor="rgba(0,0,0,0)",
+            height=px_per_unit * (y_range[1] - y_range[0]),
+            width=px_per_unit * (x_range[1] - x_range[0])
+        )
+        return fig
+
     # bottles = backups+1
-    # NEW FUNCTION, calculates pct filled for multiple bottles
+    # calculates pct filled for multiple bottles
     def list_mult_bottles(mL_left, mL_start,plot_df):
-        mL_used=mL_start-mL_left
-
-        num_bottles = plot_df["Backups"].values[0] + 1
-        bottle_ml = plot_df["mL"].values[0]
-        first_bottle_pct = mL_used / bottle_ml
-
-        pct_list = []
-
-        if first_bottle_pct < 1:
-            # plot first bottle percent filled, and the rest full=1
-            pct_list = [1] * (num_bottles - 1)
-            first_bottle_pct_filled=1-first_bottle_pct
-
-            # if mL left > mL start
-            if mL_left > mL_start:
-                first_bottle_pct_filled=1
-            pct_list.insert(0, first_bottle_pct_filled)
-            return pct_list
-        else:
-            for i in range(0, num_bottles):
-                if first_bottle_pct > 1:
-                    # plot first bottle at 0, then check next bottles
-                    pct_list.append(0)
-                    next_ml_used = mL_used - bottle_ml
-                    first_bottle_pct = next_ml_used / bottle_ml
-                    mL_used=next_ml_used
-                elif first_bottle_pct < 1:
-                    pct_list.append(1-first_bottle_pct)
-                    first_bottle_pct = 1
+        """
+        Fill (0-1) of each bottle of one fragrance, bottles used up in order. See bottle_fills.
+
+        Args:
+            mL_left (float): Estimated mL left, from sum_wears.
+            mL_start (float): mL of all bottles at the start, from sum_wears.
+            plot_df (pd.DataFrame): The fragrance's wear rows, for 'Backups' and bottle size 'mL'.
+
+        Returns:
+            list: Fill of each of the Backups + 1 bottles, the one in use first.
+        """
+        fills = WearsFunctions.bottle_fills(
+            [mL_left], [mL_start], [plot_df["mL"].values[0]], [plot_df["Backups"].values[0] + 1]
+        )
+        return fills[0, :plot_df["Backups"].values[0] + 1].tolist()
+
+    def bottle_fills(mL_left, mL_start, bottle_ml, num_bottles):
+        """
+        Fill levels of every bottle for many fragrances at once.
+
+        Bottle k (0 is the one in use) holds what is left of the first (k+1) * bottle_ml mL used,
+        so its fill is clip(k + 1 - mL_used / bottle_ml, 0, 1). Using less than nothing
+        (mL_left > mL_start) keeps every bottle full, using more than everything empties them all.
+
+        Args:
+            mL_left (array-like): mL left per fragrance.
+            mL_start (array-like): mL at the start per fragrance.
+            bottle_ml (array-like): Size of one bottle per fragrance.
+            num_bottles (array-like): Bottles per fragrance (Backups + 1).
+
+        Returns:
+            np.ndarray: fragrances x max(num_bottles) fills, NaN past a fragrance's last bottle.
+        """
+        mL_left = np.asarray(mL_left, dtype=float)
+        mL_start = np.asarray(mL_start, dtype=float)
+        bottle_ml = np.asarray(bottle_ml, dtype=float)
+        num_bottles = np.asarray(num_bottles, dtype=int)
+
+        bottles_used = (mL_start - mL_left) / bottle_ml
+        k = np.arange(num_bottles.max(initial=0))
+        fills = np.clip(k + 1 - bottles_used[:, None], 0, 1)
+        return np.where(k < num_bottles[:, None], fills, np.nan)
+
+
+class WearsIndex:
+    """
+    Per-fragrance aggregates of a wears DataFrame, built once so page views are lookups.
+
+    Rows are stably sorted by the fragrance's categorical code, so each fragrance's rows are one
+    contiguous range [start, stop) and keep their sheet order. Totals, ranks and the bar chart
+    ordering are computed with the same pandas calls sum_wears and all_wears_plot used to make
+    per view, so results are identical.
+
+    Wears recorded in the wear log (see wear_log.py) are folded in with sync_log(), touching only
+    the fragrances that were worn; version counts those updates.
+
+    Attributes:
+        wears_df (pd.DataFrame): The frame the index was built from, without wear log entries.
+        log_entries (list): (date, fragrance, wears) wear log entries applied, see WearEvents.
+        log_skipped (list): Wear log lines that couldn't be read, as lists of their cells.
+        log_unknown (list): Fragrances in the wear log with no rows in the "Wears for" sheets,
+            whose entries were skipped. Both are for the app to show.
+        version (int): Number of wear log updates applied.
+        data_version (tuple): Key for anything derived from the index, e.g. cached figures.
+        totals (pd.Series): All time wears per fragrance.
+        order (pd.DataFrame): 'Fragrance' and 'Wears' sorted by wears descending, as plotted.
+        starting_ml (pd.Series): mL of all bottles (mL + mL * Backups) per fragrance.
+        bottle_ml (pd.Series): Bottle size per fragrance, from its first row.
+        backups (pd.Series): Number of backup bottles per fragrance, from its first row.
+    """
+
+    _uids = itertools.count()
+    # indexes still in use (e.g. a watcher.Dataset's), by id of their frame, so of() keeps
+    # returning them after the memo slot has moved on to another frame
+    _live = weakref.WeakValueDictionary()
+
+    def __init__(self, wears_df):
+        self.wears_df = wears_df
+
+        categorical = pd.Categorical(wears_df["Fragrance"])
+        codes = categorical.codes
+        self._rows = wears_df.iloc[np.argsort(codes, kind="stable")]
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes[codes >= 0], minlength=len(categorical.categories)))])
+        self._ranges = {frag: (bounds[i], bounds[i + 1]) for i, frag in enumerate(categorical.categories)}
+
+        self.totals = wears_df.groupby(["Fragrance"])["Wears"].sum()
+        self._refresh_order()
+
+        firsts = self._rows.groupby("Fragrance", sort=True)[["mL", "Backups"]].first()
+        self.bottle_ml = firsts["mL"]
+        self.backups = firsts["Backups"]
+
+        # validation.py makes the Wears tabs agree on mL and Backups; for a frame it didn't clean,
+        # if total_ml no consensus amongst Wears tabs, take the last distinct value (as sum_wears always has)
+        total_ml = pd.DataFrame({"Fragrance": self._rows["Fragrance"],
+                                 "total_ml": self._rows["mL"] + (self._rows["mL"] * self._rows["Backups"])})
+        self.starting_ml = total_ml.drop_duplicates().groupby("Fragrance", sort=True)["total_ml"].last()
+
+        # wear log state: rows of fragrances worn since the workbook, and how far the log was read
+        self.uid = next(WearsIndex._uids)
+        self.version = 0
+        self.sheets = sorted(wears_df["sheet_name"].unique())
+        self._patched = {}
+        self._next_label = wears_df.index.max() + 1 if len(wears_df) else 0
+        self.log_entries = []
+        self.log_skipped = []
+        self.log_unknown = []
+        self._workbook_totals = self.totals
+        self._workbook_sheets = self.sheets
+        self._log_positions = {}
+        self._log_lock = threading.RLock()
+
+    def _refresh_order(self):
+        """Recompute ranks and the bar chart order from totals. Costs O(F log F) for F fragrances, not rows."""
+        self._ranks = self.totals.rank(ascending=False).to_dict()
+        order = self.totals.reset_index().sort_values(by="Wears", ascending=False).reset_index()
+        self._positions = {frag: i for i, frag in enumerate(order["Fragrance"])}
+        self.order = order
+
+    @staticmethod
+    def of(wears_df):
+        """
+        Get the index for wears_df, building it only the first time this frame is seen.
+
+        The memo is keyed on the frame's identity, which is safe because the index keeps a
+        reference to the frame. The cached wears frame from read_wears() is reused across
+        reruns, so in the app this builds once per data version. The memo only holds the latest
+        frame's index, but an index that is still referenced elsewhere (a Dataset's) is returned
+        for its frame too, so it and its wear log state are never built twice.
+        """
+        index = WearsIndex._live.get(id(wears_df))
+        if index is not None and index.wears_df is wears_df:
+            return index
+        index = loader.memoize("wears_index", id(wears_df), lambda: WearsIndex(wears_df))
+        WearsIndex._live[id(wears_df)] = index
+        return index
+
+    @property
+    def data_version(self):
+        """Changes whenever the data changes: a new index (new workbook) or a wear log update."""
+        return (self.uid, self.version)
+
+    def __contains__(self, frag):
+        return frag in self._ranges
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def rows(self, frag):
+        """Rows of wears_df for one fragrance, in their original order. A copy, safe to modify."""
+        if frag in self._patched:
+            return self._patched[frag].copy()
+        start, stop = self._ranges[frag]
+        return self._rows.iloc[start:stop].copy()
+
+    def rank(self, frag):
+        """All time rank by total wears, 1 is the most worn."""
+        return int(self._ranks[frag])
+
+    def position(self, frag):
+        """Position of the fragrance's bar in the all wears chart, starting at 0."""
+        return self._positions[frag]
+
+    def sheet_for(self, date):
+        """Name of the "Wears for" sheet a date belongs to, e.g. 'Wears for 2021-2022' for 2022."""
+        for sheet in self.sheets:
+            if str(date.year) in sheet:
+                return sheet
+        return f"Wears for {date.year}"
+
+    def ingest(self, entries):
+        """
+        Add wears to the index, updating only the fragrances in entries.
+
+        A wear in a year that already has a row adds to that row, otherwise a row is added copying
+        the fragrance's latest mL and Backups. Fragrances with no rows in the "Wears for" sheets are
+        skipped, since their bottle sizes are unknown, and added to log_unknown.
+
+        Args:
+            entries (list): (datetime.date, fragrance, wears) tuples, as from wear_log.read_wear_log.
+
+        Returns:
+            int: Number of entries applied.
+        """
+        deltas = {}
+        logged = []
+        unknown = []
+        for date, frag, wears in entries:
+            if frag not in self:
+                if frag not in unknown and frag not in self.log_unknown:
+                    unknown.append(frag)
+                continue
+            key = (frag, self.sheet_for(date))
+            deltas[key] = deltas.get(key, 0) + wears
+            logged.append((date, frag, wears))
+        if unknown:
+            log.warning("Wear log entries skipped, wears not tracked for fragrances: %s", ', '.join(unknown))
+            with self._log_lock:
+                self.log_unknown = self.log_unknown + unknown
+        if not deltas:
+            return 0
+
+        # other sessions read the index while this runs: work on copies and swap them in at the end,
+        # so a reader sees the old or the new totals and rows, never ones being modified
+        with self._log_lock:
+            patched = dict(self._patched)
+            totals = self.totals.copy()
+            sheets = self.sheets
+            for (frag, sheet), wears in deltas.items():
+                if frag in patched:
+                    rows = patched[frag].copy()
+                else:
+                    start, stop = self._ranges[frag]
+                    rows = self._rows.iloc[start:stop].copy()
+                in_sheet = rows.index[rows["sheet_name"] == sheet]
+                if len(in_sheet):
+                    rows.loc[in_sheet[-1], "Wears"] += wears
                 else:
-                    pct_list.append(1)
-                    first_bottle_pct = 1
+                    new_row = rows.iloc[[-1]].copy()
+                    new_row.index = [self._next_label]
+                    new_row["Wears"] = wears
+                    new_row["sheet_name"] = sheet
+                    self._next_label += 1
+                    rows = pd.concat([rows, new_row]).sort_values(by="sheet_name", kind="stable")
+                    if sheet not in sheets:
+                        sheets = sorted(sheets + [sheet])
+                patched[frag] = rows
+                totals[frag] += wears
+
+            self.sheets = sheets
+            self._patched = patched
+            self.totals = totals
+            self.log_entries = self.log_entries + logged
+            self._refresh_order()
+            self.version += 1
+            return len(logged)
+
+    def sync_log(self, log_file=None):
+        """
+        Ingest whatever was appended to the wear log since the last sync.
+
+        Reads only the new bytes of the log, so a rerun with no new wears is one os.stat. Lines
+        that can't be read are skipped and added to log_skipped. If the log was cleared or
+        replaced since the last sync (see wear_log.read_wear_log), the wears it had are taken out
+        again: the index goes back to the workbook's wears and every log is read from the start.
+
+        Args:
+            log_file (str, optional): Path to the log. Defaults to wear_log.WEAR_LOG_FILE.
 
-            #pct list is bottle pct filled
-            return pct_list
+        Returns:
+            int: Number of entries applied.
+        """
+        if log_file is None:
+            log_file = wear_log.WEAR_LOG_FILE
+        with self._log_lock:
+            entries, position, skipped, replaced = wear_log.read_wear_log(log_file, self._log_positions.get(log_file))
+            self._log_positions[log_file] = position
+            if not replaced:
+                if skipped:
+                    self.log_skipped = self.log_skipped + skipped
+                return self.ingest(entries)
+
+            self._reset_log()
+            applied = 0
+            for other in list(self._log_positions):
+                if other != log_file:
+                    entries_other, self._log_positions[other], skipped_other, _ = wear_log.read_wear_log(other)
+                else:
+                    entries_other, skipped_other = entries, skipped
+                self.log_skipped = self.log_skipped + skipped_other
+                applied += self.ingest(entries_other)
+            return applied
+
+    def _reset_log(self):
+        """Back to the workbook's wears, as if no wear log had been read."""
+        # swapped in like ingest() does, so a reader sees either the old or the new state
+        self.sheets = self._workbook_sheets
+        self._patched = {}
+        self.totals = self._workbook_totals
+        self.log_entries = []
+        self.log_skipped = []
+        self.log_unknown = []
+        self._refresh_order()
+        self.version += 1
+
+    def to_frame(self):
+        """The wears DataFrame including wear log entries, in the same layout as read_wears()."""
+        if not self._patched:
+            return self.wears_df
+        base = self.wears_df[~self.wears_df["Fragrance"].isin(list(self._patched))]
+        frame = pd.concat([base] + list(self._patched.values())).sort_values(by="sheet_name", kind="stable")
+        # new sheets and summed wears fall back to object/int64 columns, compact them again
+        return schema.compact(frame, schema.WEARS)